@@ -0,0 +1,128 @@
+import os
+from app import db
+from models import User, Battery, BatteryStatusHistory
+from sqlalchemy import select, func, case, literal, cast, union_all, String
+from ttl_cache import TTLCache
+from events import latest_event_id
+
+ANALYTICS_CACHE_TTL = float(os.environ.get('ANALYTICS_CACHE_TTL', '600'))
+PERCENTILES = (('p50', 0.5), ('p90', 0.9))
+DIMENSIONS = ('overall', 'status', 'technician', 'battery_type')
+
+# Per-worker cache keyed by period and change-log watermark; entries expire after ANALYTICS_CACHE_TTL
+analytics_cache = TTLCache(ttl=ANALYTICS_CACHE_TTL, max_size=64)
+
+
+def _seconds_between(later, earlier):
+    """Portable ``later - earlier`` in seconds"""
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday(later) - func.julianday(earlier)) * 86400.0
+    return func.extract('epoch', later - earlier)
+
+
+def _history_steps(start, end):
+    """History rows of batteries received in [start, end) with their previous step.
+
+    ``prev_status``/``prev_at`` come from LAG over ``updated_at`` partitioned
+    by battery; ``status_rank`` numbers repeated visits to the same status.
+    """
+    order = (BatteryStatusHistory.updated_at, BatteryStatusHistory.id)
+    return select(
+        BatteryStatusHistory.status,
+        BatteryStatusHistory.updated_at,
+        BatteryStatusHistory.updated_by,
+        Battery.battery_type,
+        Battery.inward_date,
+        func.lag(BatteryStatusHistory.status).over(
+            partition_by=BatteryStatusHistory.battery_id, order_by=order).label('prev_status'),
+        func.lag(BatteryStatusHistory.updated_at).over(
+            partition_by=BatteryStatusHistory.battery_id, order_by=order).label('prev_at'),
+        func.row_number().over(
+            partition_by=(BatteryStatusHistory.battery_id, BatteryStatusHistory.status),
+            order_by=order).label('status_rank')
+    ).join(Battery, Battery.id == BatteryStatusHistory.battery_id).where(
+        Battery.inward_date >= start, Battery.inward_date < end
+    ).cte('steps')
+
+
+def turnaround_statement(start, end):
+    """One statement returning ``(dimension, key, count, avg, p50, p90, max)`` rows in seconds.
+
+    Dimensions: ``status`` is time spent in each status before the next
+    transition; ``overall``, ``technician`` (who first marked it Ready) and
+    ``battery_type`` are Received-to-first-Ready turnaround.
+    """
+    steps = _history_steps(start, end)
+    first_ready = (steps.c.status == 'Ready') & (steps.c.status_rank == 1)
+    turnaround = _seconds_between(steps.c.updated_at, steps.c.inward_date)
+
+    durations = union_all(
+        select(literal('status').label('dimension'), steps.c.prev_status.label('key'),
+               _seconds_between(steps.c.updated_at, steps.c.prev_at).label('seconds'))
+        .where(steps.c.prev_at.isnot(None)),
+        select(literal('overall'), literal('all'), turnaround).where(first_ready),
+        select(literal('technician'), cast(steps.c.updated_by, String), turnaround).where(first_ready),
+        select(literal('battery_type'), steps.c.battery_type, turnaround).where(first_ready),
+    ).subquery('durations')
+
+    group = (durations.c.dimension, durations.c.key)
+    ranked = select(
+        durations.c.dimension,
+        durations.c.key,
+        durations.c.seconds,
+        func.row_number().over(partition_by=group, order_by=durations.c.seconds).label('rn'),
+        func.count().over(partition_by=group).label('n')
+    ).subquery('ranked')
+
+    # Nearest-rank percentiles: the first value whose rank reaches p * n
+    percentiles = [
+        func.min(case((ranked.c.rn >= fraction * ranked.c.n, ranked.c.seconds))).label(name)
+        for name, fraction in PERCENTILES
+    ]
+    return select(
+        ranked.c.dimension,
+        ranked.c.key,
+        func.count(),
+        func.avg(ranked.c.seconds),
+        *percentiles,
+        func.max(ranked.c.seconds)
+    ).group_by(ranked.c.dimension, ranked.c.key)
+
+
+def compute_turnaround(start, end):
+    """Run the turnaround statement for [start, end) and shape the rows by dimension"""
+    result = {dimension: [] for dimension in DIMENSIONS}
+    for dimension, key, count, avg, *rest in db.session.execute(turnaround_statement(start, end)):
+        entry = {'key': key, 'count': int(count), 'avg': round(float(avg or 0.0), 1)}
+        for (name, _fraction), value in zip(PERCENTILES, rest):
+            entry[name] = round(float(value or 0.0), 1)
+        entry['max'] = round(float(rest[-1] or 0.0), 1)
+        result[dimension].append(entry)
+
+    names = {}
+    technician_ids = [int(entry['key']) for entry in result['technician'] if entry['key']]
+    if technician_ids:
+        names = dict(db.session.query(User.id, User.full_name).filter(User.id.in_(technician_ids)))
+    for entry in result['technician']:
+        entry['name'] = names.get(int(entry['key']), f"User {entry['key']}") if entry['key'] else 'Unknown'
+
+    for dimension in DIMENSIONS:
+        result[dimension].sort(key=lambda entry: -entry['count'])
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'overall': result['overall'][0] if result['overall'] else None,
+        'by_status': result['status'],
+        'by_technician': result['technician'],
+        'by_battery_type': result['battery_type'],
+    }
+
+
+def turnaround_for_period(start, end):
+    """Cached turnaround analytics for batteries received in [start, end).
+
+    Every intake and status change logs an event, so keying on the latest
+    event id never serves figures older than the data (or the report ETag).
+    """
+    key = (start, end, latest_event_id())
+    return analytics_cache.get(key, lambda _key: compute_turnaround(start, end))
@@ -0,0 +1,181 @@
+import logging
+from functools import wraps
+from flask import Blueprint, request, jsonify
+from flask_login import current_user
+from app import db
+from models import Battery
+from workflow import check_transition, apply_status_changes, TransitionError
+from intake import bulk_intake, IntakeError, MAX_INTAKE_ROWS
+from reports import period_bounds
+from analytics import turnaround_for_period
+from replica import read_only
+
+API_ROLES = ('technician', 'shop_staff', 'admin')
+MAX_BULK_UPDATES = 500
+MAX_COMMENT_LENGTH = 1000
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def api_login_required(view):
+    """Like login_required, but answers with JSON errors instead of redirecting"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Authentication required.'}), 401
+        if current_user.role not in API_ROLES:
+            return jsonify({'error': 'Access denied.'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _load_batteries(updates):
+    """Fetch every referenced battery with at most two IN queries"""
+    ids = {u['id'] for u in updates if isinstance(u.get('id'), int)}
+    codes = {u['battery_id'] for u in updates if isinstance(u.get('battery_id'), str)}
+    by_id, by_code = {}, {}
+    if ids:
+        for battery in Battery.query.filter(Battery.id.in_(ids)):
+            by_id[battery.id] = battery
+    if codes:
+        for battery in Battery.query.filter(Battery.battery_id.in_(codes)):
+            by_code[battery.battery_id] = battery
+    return by_id, by_code
+
+
+def _validate(update, by_id, by_code, seen):
+    """Return ``(battery, service_price, comments)`` or raise ValueError with a short message"""
+    if not isinstance(update, dict):
+        raise ValueError('Each update must be an object')
+    if isinstance(update.get('id'), int):
+        battery = by_id.get(update['id'])
+    elif isinstance(update.get('battery_id'), str):
+        battery = by_code.get(update['battery_id'])
+    else:
+        raise ValueError('Missing id or battery_id')
+    if battery is None:
+        raise ValueError('Battery not found')
+    if battery.id in seen:
+        raise ValueError('Battery listed more than once')
+    seen.add(battery.id)
+
+    status = update.get('status')
+    if not isinstance(status, str):
+        raise ValueError('Missing status')
+    check_transition(battery.status, status)
+
+    service_price = update.get('service_price')
+    if service_price is not None:
+        try:
+            service_price = float(service_price)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid service_price')
+        if service_price < 0:
+            raise ValueError('Invalid service_price')
+
+    comments = update.get('comments')
+    if comments is None:
+        comments = ''
+    if not isinstance(comments, str):
+        raise ValueError('Invalid comments')
+    if len(comments) > MAX_COMMENT_LENGTH:
+        raise ValueError(f'comments longer than {MAX_COMMENT_LENGTH} characters')
+    return battery, service_price, comments
+
+
+@api_bp.route('/batteries/status', methods=['POST'])
+@api_login_required
+def bulk_update_status():
+    """Apply many status transitions in one transaction.
+
+    Body: ``{"updates": [{"id" | "battery_id", "status", "service_price"?,
+    "comments"?}], "atomic": false}``. With ``atomic`` set, any invalid
+    update rejects the whole batch; otherwise valid updates are applied and
+    invalid ones are reported per item.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('updates'), list):
+        return jsonify({'error': 'Expected a JSON object with an "updates" list.'}), 400
+    updates = payload['updates']
+    atomic = bool(payload.get('atomic', False))
+    if not updates:
+        return jsonify({'error': 'No updates given.'}), 400
+    if len(updates) > MAX_BULK_UPDATES:
+        return jsonify({'error': f'At most {MAX_BULK_UPDATES} updates per request.'}), 413
+
+    by_id, by_code = _load_batteries([u for u in updates if isinstance(u, dict)])
+    seen = set()
+    results, changes = [], []
+    for update in updates:
+        ref = update.get('id', update.get('battery_id')) if isinstance(update, dict) else None
+        try:
+            battery, service_price, comments = _validate(update, by_id, by_code, seen)
+        except (TransitionError, ValueError) as e:
+            results.append({'ref': ref, 'ok': False, 'error': str(e)})
+            continue
+        changes.append((battery, update['status'], comments, service_price))
+        results.append({'id': battery.id, 'battery_id': battery.battery_id, 'ok': True, 'status': update['status']})
+
+    failed = len(updates) - len(changes)
+    if atomic and failed:
+        return jsonify({'applied': 0, 'failed': failed, 'results': results}), 409
+
+    if changes:
+        try:
+            apply_status_changes(changes, current_user.id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logging.exception('Bulk status update failed')
+            return jsonify({'error': 'Could not save status updates.'}), 500
+
+    return jsonify({'applied': len(changes), 'failed': failed, 'results': results})
+
+
+@api_bp.route('/batteries/intake', methods=['POST'])
+@api_login_required
+def bulk_intake_batteries():
+    """Register many batteries from a JSON array of intake rows.
+
+    Accepts ``[{...}, ...]`` or ``{"rows": [...]}`` with the same fields as
+    the single-entry form. Valid rows are committed; invalid ones are
+    listed in ``errors`` with their 1-based row number.
+    """
+    if current_user.role not in ('shop_staff', 'admin'):
+        return jsonify({'error': 'Access denied.'}), 403
+    payload = request.get_json(silent=True)
+    rows = payload.get('rows') if isinstance(payload, dict) else payload
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'error': 'Expected a JSON array of intake rows.'}), 400
+    if len(rows) > MAX_INTAKE_ROWS:
+        return jsonify({'error': f'At most {MAX_INTAKE_ROWS} batteries per request.'}), 413
+
+    try:
+        result = bulk_intake(rows, current_user.id)
+        db.session.commit()
+    except IntakeError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception:
+        db.session.rollback()
+        logging.exception('Bulk intake failed')
+        return jsonify({'error': 'Could not register batteries.'}), 500
+
+    status = 201 if result['created'] else 422
+    return jsonify(result), status
+
+
+@api_bp.route('/analytics/turnaround')
+@api_login_required
+@read_only
+def turnaround_analytics():
+    """Turnaround percentiles in seconds for ``?year=YYYY[&month=M]``"""
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+    if year is None:
+        return jsonify({'error': 'year is required.'}), 400
+    try:
+        start, end = period_bounds(year, month)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(turnaround_for_period(start, end))
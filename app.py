@@ -5,38 +5,21 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+from replica import RoutingSession, replica_binds, init_replica
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Set up logging (LOG_LEVEL=DEBUG for verbose local debugging)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 
-# Create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # needed for url_for to generate with https
-
-# Configure the database - use PostgreSQL for production
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-
-# Initialize extensions
-db.init_app(app)
-login_manager.init_app(app)
-login_manager.login_view = 'auth.login'  # type: ignore
-login_manager.login_message = 'Please log in to access this page.'
-
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    from user_cache import load_cached_user
+    return load_cached_user(int(user_id))
 
 def initialize_database():
     """Initialize database with default users and settings"""
@@ -76,12 +59,16 @@ def initialize_database():
         ('battery_id_padding', '4')
     ]
     
+    settings_added = False
     for key, value in default_settings:
         if not SystemSettings.query.filter_by(setting_key=key).first():
             setting = SystemSettings()
             setting.setting_key = key
             setting.setting_value = value
             db.session.add(setting)
+            settings_added = True
+    if settings_added:
+        SystemSettings.bump_version()
     
     try:
         db.session.commit()
@@ -89,15 +76,92 @@ def initialize_database():
         logging.error(f"Error creating default users and settings: {e}")
         db.session.rollback()
 
-with app.app_context():
-    # Import models to ensure tables are created
-    import models
+def setup_database():
+    """Create tables, apply migrations and seed defaults (one-shot, not per worker)"""
+    import models  # noqa: F401  register the tables with the metadata
+    from migrations import upgrade
     db.create_all()
+    applied = upgrade(db.engine)
     initialize_database()
+    return applied
+
+def register_commands(app):
+    import click
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create tables, apply pending migrations and seed default users and settings."""
+        applied = setup_database()
+        for version, name in applied:
+            click.echo(f"Applied {version:04d} {name}")
+        click.echo("Database is ready")
+
+    @app.cli.command('purge-events')
+    def purge_events_command():
+        """Delete live-update events older than the retention window."""
+        from events import purge_old_events
+        deleted = purge_old_events()
+        db.session.commit()
+        click.echo(f"Deleted {deleted} old events")
 
-# Register blueprints
-from auth import auth_bp
-from routes import main_bp
+def engine_options(database_url):
+    """Connection pool settings from DB_POOL_* environment variables"""
+    options = {
+        "pool_recycle": int(os.environ.get('DB_POOL_RECYCLE', '300')),
+        "pool_pre_ping": os.environ.get('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'yes'),
+    }
+    # Sizing only applies to server databases; SQLite memory pools reject these options
+    if database_url and not database_url.startswith('sqlite'):
+        options.update({
+            "pool_size": int(os.environ.get('DB_POOL_SIZE', '5')),
+            "max_overflow": int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+            "pool_timeout": float(os.environ.get('DB_POOL_TIMEOUT', '30')),
+        })
+    return options
 
-app.register_blueprint(auth_bp)
-app.register_blueprint(main_bp)
+def create_app(config=None):
+    """Build the application. Does no schema work; run ``flask init-db`` once per deploy."""
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # needed for url_for to generate with https
+    
+    # Configure the database - use PostgreSQL for production
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    # Optional read replica for reports and exports (see replica.py)
+    replica_url = os.environ.get("REPLICA_DATABASE_URL")
+    app.config["SQLALCHEMY_BINDS"] = replica_binds(replica_url, engine_options(replica_url))
+    if config:
+        app.config.update(config)
+    
+    # Initialize extensions
+    db.init_app(app)
+    login_manager.init_app(app)
+    login_manager.login_view = 'auth.login'  # type: ignore
+    login_manager.login_message = 'Please log in to access this page.'
+    
+    # Blueprints (and through them the models) are imported only when an app is built
+    from auth import auth_bp
+    from routes import main_bp
+    from metrics import metrics_bp, init_metrics
+    from api import api_bp
+    
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(main_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(api_bp)
+    
+    with app.app_context():
+        init_metrics(app, db.engines.values())
+    init_replica(app)
+    
+    @app.before_request
+    def refresh_settings_cache():
+        """One primary-key read per request keeps the settings cache in step across workers"""
+        from flask import request
+        from models import SystemSettings
+        if request.endpoint != 'static':
+            SystemSettings.check_cache()
+    
+    register_commands(app)
+    return app
@@ -0,0 +1,325 @@
+import gzip
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from app import db
+from models import User, Customer, Battery, BatteryStatusHistory, SystemSettings, BatteryIdCounter
+from stats import rebuild_daily_rollup
+from sqlalchemy import select, insert
+from werkzeug.security import generate_password_hash
+
+BACKUP_FORMAT = 'battery_erp_backup'
+BACKUP_VERSION = 2
+BACKUP_BATCH_SIZE = 1000
+RESTORE_BATCH_SIZE = 1000
+RESTORED_USER_PASSWORD = 'password123'
+BACKUP_EXTENSIONS = ('.json', '.jsonl', '.jsonl.gz')
+
+
+class BackupError(Exception):
+    """Raised when a backup file is malformed or fails verification"""
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _user_row(user):
+    # Passwords are never exported
+    return {
+        'username': user.username,
+        'full_name': user.full_name,
+        'role': user.role,
+        'created_at': _isoformat(user.created_at),
+        'is_active': user.active
+    }
+
+
+def _customer_row(customer):
+    return {
+        'id': customer.id,
+        'name': customer.name,
+        'mobile': customer.mobile,
+        'mobile_secondary': customer.mobile_secondary,
+        'created_at': _isoformat(customer.created_at)
+    }
+
+
+def _battery_row(battery):
+    return {
+        'id': battery.id,
+        'battery_id': battery.battery_id,
+        'customer_id': battery.customer_id,
+        'battery_type': battery.battery_type,
+        'voltage': battery.voltage,
+        'capacity': battery.capacity,
+        'status': battery.status,
+        'inward_date': _isoformat(battery.inward_date),
+        'service_price': battery.service_price,
+        'pickup_charge': battery.pickup_charge,
+        'is_pickup': battery.is_pickup
+    }
+
+
+def _history_row(history):
+    return {
+        'id': history.id,
+        'battery_id': history.battery_id,
+        'status': history.status,
+        'comments': history.comments,
+        'updated_by': history.updated_by,
+        'updated_at': _isoformat(history.updated_at)
+    }
+
+
+def _setting_row(setting):
+    return {
+        'setting_key': setting.setting_key,
+        'setting_value': setting.setting_value,
+        'updated_at': _isoformat(setting.updated_at)
+    }
+
+
+# Restore relies on this order: customers before batteries before history
+BACKUP_TABLES = [
+    ('users', User, _user_row),
+    ('customers', Customer, _customer_row),
+    ('batteries', Battery, _battery_row),
+    ('status_history', BatteryStatusHistory, _history_row),
+    ('settings', SystemSettings, _setting_row),
+]
+
+
+def encode_record(table, row):
+    """Serialize one backup line; the manifest checksums cover these exact bytes"""
+    return json.dumps({'table': table, 'row': row}, separators=(',', ':')) + '\n'
+
+
+def stream_backup(batch_size=BACKUP_BATCH_SIZE):
+    """Yield a JSON Lines backup, one chunk per fetched batch.
+
+    The first line is a header, then one line per row tagged with its
+    table, and the last line is a manifest with per-table row counts and
+    SHA-256 checksums of the row lines.
+    """
+    yield json.dumps({
+        'format': BACKUP_FORMAT,
+        'version': BACKUP_VERSION,
+        'timestamp': datetime.now().isoformat()
+    }) + '\n'
+
+    manifest = {}
+    for table, model, serialize in BACKUP_TABLES:
+        digest = hashlib.sha256()
+        count = 0
+        statement = select(model).order_by(model.id).execution_options(yield_per=batch_size)
+        for batch in db.session.execute(statement).scalars().partitions():
+            lines = [encode_record(table, serialize(obj)) for obj in batch]
+            chunk = ''.join(lines)
+            digest.update(chunk.encode('utf-8'))
+            count += len(lines)
+            yield chunk
+        manifest[table] = {'rows': count, 'sha256': digest.hexdigest()}
+
+    yield json.dumps({'manifest': manifest}) + '\n'
+
+
+def gzip_stream(chunks):
+    """Gzip-compress a stream of text chunks without buffering the whole output"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _read_legacy(fileobj):
+    """Records from the original single-document JSON backup format"""
+    backup_data = json.load(fileobj)
+    for table, _model, _serialize in BACKUP_TABLES:
+        for row in backup_data.get(table, []):
+            yield table, row
+
+
+def read_backup_lines(fileobj):
+    """Yield (table, row) from a JSON Lines backup, verifying the manifest at the end"""
+    counts = {}
+    digests = {}
+    manifest = None
+    header_seen = False
+
+    for line in fileobj:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if not header_seen:
+            if record.get('format') != BACKUP_FORMAT:
+                raise BackupError('Not a battery ERP backup file.')
+            header_seen = True
+            continue
+        if 'manifest' in record:
+            manifest = record['manifest']
+            break
+        table = record['table']
+        digests.setdefault(table, hashlib.sha256()).update(line)
+        counts[table] = counts.get(table, 0) + 1
+        yield table, record['row']
+
+    if manifest is None:
+        raise BackupError('Backup file is truncated: manifest missing.')
+    for table, expected in manifest.items():
+        actual_digest = digests[table].hexdigest() if table in digests else hashlib.sha256().hexdigest()
+        if counts.get(table, 0) != expected['rows'] or actual_digest != expected['sha256']:
+            raise BackupError(f'Backup verification failed for {table}.')
+
+
+def open_backup(fileobj, filename):
+    """Return an iterator of (table, row) records from an uploaded backup file"""
+    if filename.endswith('.gz'):
+        fileobj = gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if filename.endswith('.json'):
+        return _read_legacy(fileobj)
+    return read_backup_lines(fileobj)
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else datetime.utcnow()
+
+
+class _BatchInserter:
+    """Buffers rows for one model and inserts them executemany-style.
+
+    When ``id_mapping`` is given, new primary keys are read back with
+    RETURNING in parameter order, so no per-row flush is needed.
+    """
+
+    def __init__(self, model, batch_size, id_mapping=None, on_flush=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.id_mapping = id_mapping
+        self.on_flush = on_flush
+        self.rows = []
+        self.old_ids = []
+        self.count = 0
+
+    def add(self, row, old_id=None):
+        self.rows.append(row)
+        self.old_ids.append(old_id)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.id_mapping is None:
+            db.session.execute(insert(self.model), self.rows)
+        else:
+            statement = insert(self.model).returning(self.model.id, sort_by_parameter_order=True)
+            result = db.session.execute(statement, self.rows)
+            for old_id, new_id in zip(self.old_ids, result.scalars()):
+                self.id_mapping[old_id] = new_id
+        self.count += len(self.rows)
+        self.rows = []
+        self.old_ids = []
+        if self.on_flush:
+            self.on_flush(self.model.__tablename__, self.count)
+
+
+def restore_backup(records, admin_id, admin_username, batch_size=RESTORE_BATCH_SIZE, progress=None):
+    """Replace all data with the backup records using batched inserts.
+
+    Everything happens in the caller's transaction; the caller commits or
+    rolls back. ``progress(table, rows_so_far)`` is called after each batch.
+    Returns per-table restored row counts.
+    """
+    # Clear existing data (preserve the admin running the restore)
+    BatteryStatusHistory.query.delete()
+    Battery.query.delete()
+    Customer.query.delete()
+    SystemSettings.query.delete()
+    User.query.filter(User.id != admin_id).delete()
+    # Re-seed battery numbering from the restored data on next intake
+    BatteryIdCounter.query.delete()
+
+    customer_ids = {}
+    battery_ids = {}
+    # One hash for every restored user instead of one per row
+    restored_password_hash = generate_password_hash(RESTORED_USER_PASSWORD)
+
+    inserters = {
+        'users': _BatchInserter(User, batch_size, on_flush=progress),
+        'customers': _BatchInserter(Customer, batch_size, customer_ids, on_flush=progress),
+        'batteries': _BatchInserter(Battery, batch_size, battery_ids, on_flush=progress),
+        'status_history': _BatchInserter(BatteryStatusHistory, batch_size, on_flush=progress),
+        'settings': _BatchInserter(SystemSettings, batch_size, on_flush=progress),
+    }
+    # Tables arrive in dependency order; flush earlier tables before using their IDs
+    depends_on = {'batteries': ['customers'], 'status_history': ['customers', 'batteries']}
+
+    current_table = None
+    for table, row in records:
+        if table != current_table:
+            for dependency in depends_on.get(table, []):
+                inserters[dependency].flush()
+            current_table = table
+
+        if table == 'users':
+            if row['username'] == admin_username:  # Don't overwrite current admin
+                continue
+            inserters['users'].add({
+                'username': row['username'],
+                'full_name': row['full_name'],
+                'role': row['role'],
+                'password_hash': restored_password_hash,
+                'active': row.get('is_active', True),
+                'created_at': _parse_datetime(row.get('created_at'))
+            })
+        elif table == 'customers':
+            inserters['customers'].add({
+                'name': row['name'],
+                'mobile': row['mobile'],
+                'mobile_secondary': row.get('mobile_secondary'),
+                'created_at': _parse_datetime(row.get('created_at'))
+            }, old_id=row['id'])
+        elif table == 'batteries':
+            customer_id = customer_ids.get(row['customer_id'])
+            if customer_id is None:
+                continue
+            inserters['batteries'].add({
+                'battery_id': row['battery_id'],
+                'customer_id': customer_id,
+                'battery_type': row['battery_type'],
+                'voltage': row['voltage'],
+                'capacity': row['capacity'],
+                'status': row['status'],
+                'service_price': row.get('service_price') or 0.0,
+                'pickup_charge': row.get('pickup_charge') or 0.0,
+                'is_pickup': row.get('is_pickup', False),
+                'inward_date': _parse_datetime(row.get('inward_date'))
+            }, old_id=row['id'])
+        elif table == 'status_history':
+            battery_id = battery_ids.get(row['battery_id'])
+            if battery_id is None:
+                continue
+            inserters['status_history'].add({
+                'battery_id': battery_id,
+                'status': row['status'],
+                'comments': row.get('comments', ''),
+                'updated_by': admin_id,  # Assign to current admin
+                'updated_at': _parse_datetime(row.get('updated_at'))
+            })
+        elif table == 'settings':
+            inserters['settings'].add({
+                'setting_key': row['setting_key'],
+                'setting_value': row['setting_value'],
+                'updated_at': _parse_datetime(row.get('updated_at'))
+            })
+
+    for inserter in inserters.values():
+        inserter.flush()
+
+    rebuild_daily_rollup()
+    SystemSettings.bump_version()
+    return {table: inserter.count for table, inserter in inserters.items()}
@@ -0,0 +1 @@
+"""Offline benchmarks for the battery repair app (SQLite or local PostgreSQL)"""
@@ -0,0 +1,190 @@
+"""
+Endpoint latency harness
+
+Drives the app through the Flask test client (default, also counts SQL
+queries per request) or against a running server with --url, and reports
+p50/p95/p99 latency, throughput and query counts per endpoint. Results can
+be saved as a baseline and later compared against it.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.synthetic --scale 10k
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.harness --compare benchmarks/baseline.json
+    python -m benchmarks.harness --url http://localhost:5000 --concurrency 50
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# (name, method, path, form data); search terms occur in benchmarks.synthetic data
+# (98962 starts the first customer's mobile for the default seed)
+ENDPOINTS = [
+    ('dashboard', 'GET', '/dashboard', None),
+    ('technician_panel', 'GET', '/technician/panel', None),
+    ('technician_panel_search', 'POST', '/technician/panel', {'search_query': 'Kumar'}),
+    ('search_mobile', 'POST', '/search', {'search_query': '98962'}),
+    ('search_name', 'POST', '/search', {'search_query': 'Priya'}),
+    ('finished_batteries', 'GET', '/finished_batteries', None),
+    ('monthly_report', 'GET', '/reports/monthly', None),
+    ('yearly_report', 'GET', '/reports/yearly', None),
+    ('export_csv', 'GET', '/export/csv', None),
+]
+
+# A result regresses when it is this much slower than the baseline
+REGRESSION_TOLERANCE = 1.25
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(timings, elapsed, queries=None):
+    result = {
+        'requests': len(timings),
+        'p50_ms': round(percentile(timings, 0.50), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'throughput_rps': round(len(timings) / elapsed, 1) if elapsed else None,
+    }
+    if queries is not None:
+        result['queries_per_request'] = max(queries)
+    return result
+
+
+def run_test_client(requests, username, password):
+    """Sequential requests through the Flask test client with SQL query counting"""
+    os.environ.setdefault('SESSION_SECRET', 'benchmark')
+    from sqlalchemy import event
+    from app import create_app, db
+
+    app = create_app()
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': password})
+    with app.app_context():
+        engine = db.engine
+
+    counter = [0]
+
+    def count_query(*_args):
+        counter[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', count_query)
+    results = {}
+    try:
+        for name, method, path, data in ENDPOINTS:
+            timings, queries = [], []
+            started = time.perf_counter()
+            for _ in range(requests):
+                counter[0] = 0
+                request_started = time.perf_counter()
+                response = client.open(path, method=method, data=data)
+                response.get_data()
+                timings.append((time.perf_counter() - request_started) * 1000)
+                queries.append(counter[0])
+                if response.status_code != 200:
+                    raise RuntimeError(f'{name}: HTTP {response.status_code}')
+            results[name] = summarize(timings, time.perf_counter() - started, queries)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_query)
+    return results
+
+
+def run_http(base_url, requests, concurrency, username, password):
+    """Concurrent requests against a running server (gunicorn or flask run)"""
+    import http.cookiejar
+    import urllib.parse
+    import urllib.request
+
+    def make_opener():
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        login = urllib.parse.urlencode({'username': username, 'password': password}).encode()
+        opener.open(base_url + '/login', data=login).read()
+        return opener
+
+    openers = [make_opener() for _ in range(concurrency)]
+
+    def fetch(index, method, path, data):
+        body = urllib.parse.urlencode(data).encode() if data and method == 'POST' else None
+        request_started = time.perf_counter()
+        with openers[index % concurrency].open(base_url + path, data=body) as response:
+            response.read()
+        return (time.perf_counter() - request_started) * 1000
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for name, method, path, data in ENDPOINTS:
+            started = time.perf_counter()
+            timings = list(pool.map(lambda index: fetch(index, method, path, data), range(requests)))
+            results[name] = summarize(timings, time.perf_counter() - started)
+    return results
+
+
+def compare(results, baseline):
+    """Return human-readable regressions of ``results`` against ``baseline``"""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get('endpoints', {}).get(name)
+        if not expected:
+            continue
+        if result['p95_ms'] > expected['p95_ms'] * REGRESSION_TOLERANCE:
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms vs baseline {expected['p95_ms']} ms")
+        if result.get('queries_per_request', 0) > expected.get('queries_per_request', sys.maxsize):
+            regressions.append(
+                f"{name}: {result['queries_per_request']} queries vs baseline {expected['queries_per_request']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='benchmark a running server instead of the test client')
+    parser.add_argument('--requests', type=int, default=50, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=1, help='parallel clients (--url only)')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--only', help='comma-separated endpoint names to run')
+    parser.add_argument('--save', nargs='?', const=BASELINE_PATH, help='write results as a baseline file')
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, help='fail if slower than a baseline file')
+    args = parser.parse_args()
+
+    if args.only:
+        wanted = set(args.only.split(','))
+        ENDPOINTS[:] = [endpoint for endpoint in ENDPOINTS if endpoint[0] in wanted]
+
+    if args.url:
+        results = run_http(args.url.rstrip('/'), args.requests, args.concurrency, args.username, args.password)
+    else:
+        results = run_test_client(args.requests, args.username, args.password)
+
+    print(f"{'endpoint':26s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'rps':>8s} {'queries':>8s}")
+    for name, result in results.items():
+        print(f"{name:26s} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} {result['p99_ms']:8.2f} "
+              f"{result['throughput_rps'] or 0:8.1f} {result.get('queries_per_request', '-'):>8}")
+
+    if args.save:
+        with open(args.save, 'w') as output:
+            json.dump({
+                'mode': 'http' if args.url else 'test_client',
+                'database': os.environ.get('DATABASE_URL', '').split('://')[0],
+                'requests': args.requests,
+                'endpoints': results
+            }, output, indent=2)
+        print(f'Baseline written to {args.save}')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file))
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Query plan benchmark for the schema migrations
+
+Builds a synthetic database, drops the migration-managed indexes, captures
+query plans and timings for the hot queries, applies the migrations and
+captures them again.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.query_plans --batteries 100000
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:////tmp/battery_bench.db')
+os.environ.setdefault('SESSION_SECRET', 'benchmark')
+
+from sqlalchemy import text
+
+from app import create_app, setup_database, db
+from benchmarks.synthetic import generate
+from migrations import upgrade
+
+MIGRATION_INDEXES = [
+    'ix_customer_mobile', 'ix_customer_mobile_digits', 'ix_customer_name_folded',
+    'ix_battery_customer_id', 'ix_customer_name_trgm', 'ix_battery_status_inward_date',
+    'ix_battery_inward_date', 'ix_status_history_battery_updated', 'ix_status_history_updated_at',
+]
+
+
+def hot_queries():
+    """(name, statement) pairs for the queries the routes run most"""
+    from datetime import datetime
+    from models import Battery
+    from queries import pending_batteries, batteries_with_customer
+    from reports import year_bounds
+    from exports import battery_export_statement
+    from search import search_batteries
+
+    start, end = year_bounds(datetime.now().year)
+    period = db.session.query(Battery.status).filter(Battery.inward_date >= start, Battery.inward_date < end)
+    return [
+        ('technician_panel pending', pending_batteries().statement),
+        ('finished_batteries page', batteries_with_customer().filter(Battery.status == 'Ready').order_by(
+            Battery.inward_date.desc(), Battery.id.desc()).limit(51).statement),
+        ('yearly report range', period.statement),
+        ('search mobile prefix', search_batteries('98765').statement),
+        ('export last update', battery_export_statement().limit(1000)),
+    ]
+
+
+def _explain(statement):
+    sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    return [' '.join(str(part) for part in row) for row in db.session.execute(text(prefix + sql))]
+
+
+def _time(statement, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        db.session.execute(statement).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+def capture(repeat):
+    return {
+        name: {'plan': _explain(statement), 'median_ms': _time(statement, repeat)}
+        for name, statement in hot_queries()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batteries', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the before/after capture as JSON')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        setup_database()
+        if db.session.query(db.func.count()).select_from(db.metadata.tables['battery']).scalar() < args.batteries:
+            generate(args.batteries)
+
+        for name in MIGRATION_INDEXES:
+            db.session.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        db.session.execute(text('DELETE FROM schema_migrations'))
+        db.session.commit()
+        before = capture(args.repeat)
+
+        upgrade(db.engine)
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        after = capture(args.repeat)
+
+    for name in before:
+        print(f"== {name}: {before[name]['median_ms']} ms -> {after[name]['median_ms']} ms")
+        for label, result in (('before', before[name]), ('after', after[name])):
+            for line in result['plan']:
+                print(f"   {label:6s} {line}")
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'before': before, 'after': after}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Serving-mode throughput benchmark
+
+Starts gunicorn once per worker class, drives the technician panel and
+search endpoints with many concurrent clients through the HTTP harness and
+prints throughput and latency side by side. Meant for a local PostgreSQL
+filled by benchmarks.synthetic; gevent is skipped unless installed.
+
+    export DATABASE_URL=postgresql://localhost/battery_bench
+    python -m benchmarks.synthetic --scale 100k && flask --app main init-db
+    python -m benchmarks.serving --concurrency 64 --requests 1000
+    python -m benchmarks.serving --modes gthread --env DB_POOL_PRE_PING=0
+"""
+import argparse
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks import harness
+
+SERVING_ENDPOINTS = ('technician_panel', 'technician_panel_search', 'search_mobile', 'search_name')
+MODES = ('sync', 'gthread', 'gevent')
+
+
+def _wait_for_port(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with code {process.returncode}')
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f'gunicorn did not listen on port {port} within {timeout}s')
+
+
+def run_mode(mode, port, requests, concurrency, extra_env):
+    env = dict(os.environ, WEB_WORKER_CLASS=mode, PORT=str(port), **extra_env)
+    env.setdefault('SESSION_SECRET', 'benchmark')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'main:app'],
+        cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _wait_for_port(port, process)
+        return harness.run_http(f'http://127.0.0.1:{port}', requests, concurrency, 'admin', 'admin123')
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default=','.join(MODES), help='comma-separated worker classes')
+    parser.add_argument('--requests', type=int, default=1000, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=64, help='parallel clients')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--env', action='append', default=[], help='extra KEY=VALUE for the server, e.g. DB_POOL_SIZE=20')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    extra_env = dict(item.split('=', 1) for item in args.env)
+    harness.ENDPOINTS[:] = [endpoint for endpoint in harness.ENDPOINTS if endpoint[0] in SERVING_ENDPOINTS]
+
+    results = {}
+    for mode in args.modes.split(','):
+        if mode == 'gevent' and importlib.util.find_spec('gevent') is None:
+            print('gevent: skipped (not installed)')
+            continue
+        results[mode] = run_mode(mode, args.port, args.requests, args.concurrency, extra_env)
+
+    print(f"{'mode':8s} {'endpoint':26s} {'rps':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s}")
+    for mode, endpoints in results.items():
+        for name, result in endpoints.items():
+            print(f"{mode:8s} {name:26s} {result['throughput_rps']:8.1f} {result['p50_ms']:8.2f} "
+                  f"{result['p95_ms']:8.2f} {result['p99_ms']:8.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({
+                'database': os.environ.get('DATABASE_URL', '').split('://')[0],
+                'concurrency': args.concurrency,
+                'requests': args.requests,
+                'server_env': extra_env,
+                'modes': results
+            }, output, indent=2)
+        print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Cold-start benchmark
+
+Starts a fresh interpreter per run and times importing ``main`` (building
+the app) and serving the first request through the test client, which is
+what each gunicorn worker or autoscale instance pays on boot. Results can
+be saved as a baseline and compared like the endpoint harness.
+
+    DATABASE_URL=sqlite:////tmp/bench.db flask --app main init-db
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.startup --runs 10 --save
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.startup --compare
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.harness import percentile, REGRESSION_TOLERANCE
+
+STARTUP_BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'startup_baseline.json')
+
+# Runs in the child interpreter; prints import and first-request times in ms
+CHILD_SCRIPT = """
+import json, logging, time
+started = time.perf_counter()
+logging.disable(logging.CRITICAL)
+from main import app
+imported = time.perf_counter()
+app.test_client().get('/login').get_data()
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'first_request_ms': (served - started) * 1000}))
+"""
+
+
+def measure_once():
+    env = dict(os.environ)
+    env.setdefault('SESSION_SECRET', 'benchmark')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT], cwd=root, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(runs):
+    samples = [measure_once() for _ in range(runs)]
+    results = {}
+    for key in ('import_ms', 'first_request_ms'):
+        values = [sample[key] for sample in samples]
+        results[key] = {
+            'p50': round(percentile(values, 0.50), 1),
+            'p95': round(percentile(values, 0.95), 1),
+            'max': round(max(values), 1),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters to start')
+    parser.add_argument('--save', nargs='?', const=STARTUP_BASELINE_PATH, help='write results as a baseline file')
+    parser.add_argument('--compare', nargs='?', const=STARTUP_BASELINE_PATH, help='fail if slower than a baseline file')
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    print(f"{'phase':18s} {'p50':>8s} {'p95':>8s} {'max':>8s}")
+    for name, result in results.items():
+        print(f"{name:18s} {result['p50']:8.1f} {result['p95']:8.1f} {result['max']:8.1f}")
+
+    if args.save:
+        with open(args.save, 'w') as output:
+            json.dump({
+                'database': os.environ.get('DATABASE_URL', '').split('://')[0],
+                'runs': args.runs,
+                'startup': results
+            }, output, indent=2)
+        print(f'Baseline written to {args.save}')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['startup']
+        regressions = [
+            f"{name}: p50 {result['p50']} ms vs baseline {baseline[name]['p50']} ms"
+            for name, result in results.items()
+            if name in baseline and result['p50'] > baseline[name]['p50'] * REGRESSION_TOLERANCE
+        ]
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Synthetic data generator
+
+Fills Customer, Battery and BatteryStatusHistory with reproducible fake data
+using batched executemany inserts. Must run inside an app context.
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import db
+from models import User, Customer, Battery, BatteryStatusHistory, BatteryIdCounter
+from stats import rebuild_daily_rollup
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+BATCH_SIZE = 5000
+
+BATTERY_TYPES = ['Car', 'Bike', 'Inverter', 'Truck', 'UPS', 'Solar']
+WORKFLOW = ['Received', 'Diagnosing', 'Repairing', 'Ready']
+FIRST_NAMES = ['Arun', 'Priya', 'Rahul', 'Anjali', 'Vijay', 'Meera', 'Suresh', 'Divya', 'Kiran', 'Fatima']
+LAST_NAMES = ['Kumar', 'Nair', 'Menon', 'Sharma', 'Pillai', 'Rao', 'Iyer', 'Khan', 'Das', 'Joseph']
+
+
+def _insert(model, rows):
+    if rows:
+        db.session.execute(model.__table__.insert(), rows)
+
+
+def _sync_sequences(*models):
+    """Move PostgreSQL serial sequences past the explicit ids inserted here"""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"))
+
+
+def generate(batteries, customers=None, seed=42, days=730, batch_size=BATCH_SIZE, progress=None):
+    """Insert ``batteries`` batteries for ``customers`` customers (default batteries // 3).
+
+    Every battery gets one history row per workflow step it has reached.
+    Returns row counts per table.
+    """
+    rng = random.Random(seed)
+    customers = customers or max(1, batteries // 3)
+    technician = User.query.filter_by(role='technician').first() or User.query.first()
+    now = datetime.utcnow().replace(microsecond=0)
+
+    first_customer = (db.session.query(db.func.max(Customer.id)).scalar() or 0) + 1
+    rows = []
+    for offset in range(customers):
+        rows.append({
+            'id': first_customer + offset,
+            'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {offset}',
+            'mobile': f'9{rng.randrange(10**8, 10**9)}',
+            'mobile_secondary': None,
+            'created_at': now - timedelta(days=days)
+        })
+        if len(rows) >= batch_size:
+            _insert(Customer, rows)
+            rows = []
+    _insert(Customer, rows)
+
+    first_battery = (db.session.query(db.func.max(Battery.id)).scalar() or 0) + 1
+    battery_rows = []
+    history_rows = []
+    history_count = 0
+    for offset in range(batteries):
+        record_id = first_battery + offset
+        inward = now - timedelta(seconds=rng.randrange(days * 86400))
+        steps = rng.choices(range(1, len(WORKFLOW) + 1), weights=[1, 1, 1, 7])[0]
+        status = WORKFLOW[steps - 1]
+        is_pickup = rng.random() < 0.2
+        battery_rows.append({
+            'id': record_id,
+            'battery_id': f'SYN{record_id:08d}',
+            'customer_id': first_customer + rng.randrange(customers),
+            'battery_type': rng.choice(BATTERY_TYPES),
+            'voltage': rng.choice(['6V', '12V', '24V', '48V']),
+            'capacity': rng.choice(['35Ah', '65Ah', '100Ah', '150Ah']),
+            'status': status,
+            'inward_date': inward,
+            'service_price': float(rng.randrange(200, 5000)) if status == 'Ready' else 0.0,
+            'pickup_charge': 100.0 if is_pickup else 0.0,
+            'is_pickup': is_pickup
+        })
+        updated_at = inward
+        for step in WORKFLOW[:steps]:
+            history_rows.append({
+                'battery_id': record_id,
+                'status': step,
+                'comments': '',
+                'updated_by': technician.id,
+                'updated_at': updated_at
+            })
+            updated_at += timedelta(minutes=rng.randrange(30, 4 * 24 * 60))
+        if len(battery_rows) >= batch_size:
+            _insert(Battery, battery_rows)
+            _insert(BatteryStatusHistory, history_rows)
+            history_count += len(history_rows)
+            battery_rows, history_rows = [], []
+            if progress:
+                progress(offset + 1, batteries)
+    _insert(Battery, battery_rows)
+    _insert(BatteryStatusHistory, history_rows)
+    history_count += len(history_rows)
+
+    # Keep derived state consistent with the new rows, so the app's next inserts don't collide
+    _sync_sequences(Customer, Battery)
+    BatteryIdCounter.query.delete()
+    rebuild_daily_rollup()
+    db.session.commit()
+    return {'customers': customers, 'batteries': batteries, 'status_history': history_count}
+
+
+def main():
+    import argparse
+    import os
+
+    os.environ.setdefault('SESSION_SECRET', 'benchmark')
+    parser = argparse.ArgumentParser(description='Fill the database from DATABASE_URL with synthetic data')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='10k')
+    parser.add_argument('--batteries', type=int, help='exact battery count (overrides --scale)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from app import create_app, setup_database
+    app = create_app()
+    with app.app_context():
+        setup_database()
+        counts = generate(
+            args.batteries or SCALES[args.scale],
+            seed=args.seed,
+            progress=lambda done, total: print(f'{done}/{total} batteries')
+        )
+    print(counts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import io
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.orm import joinedload, selectinload
+from models import Battery, BatteryStatusHistory, SystemSettings
+from page_cache import RenderedPageCache
+from replica import primary_reads
+import pdf
+
+# Processes rendering PDFs for batch downloads; 0 renders in the request thread
+DOCUMENT_WORKERS = int(os.environ.get('DOCUMENT_WORKERS', '2'))
+DOCUMENT_CACHE_SIZE = int(os.environ.get('DOCUMENT_CACHE_SIZE', '512'))
+DOCUMENT_BATCH_SIZE = 200
+
+document_cache = RenderedPageCache(max_size=DOCUMENT_CACHE_SIZE)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _render_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: forking a threaded web worker can deadlock the child
+            _pool = ProcessPoolExecutor(max_workers=DOCUMENT_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def document_version(battery):
+    """Version of a battery's documents: its status history plus the settings version, or None"""
+    settings_version = SystemSettings._cache['version']
+    if settings_version is None:
+        return None
+    history = battery.status_history
+    updated_at = max((entry.updated_at for entry in history), default=battery.inward_date)
+    return f'{updated_at.isoformat()}|{len(history)}|{settings_version}'
+
+
+def document_data(battery, shop_name):
+    """Plain dict of everything the PDF layouts print, safe to send to a worker process"""
+    customer = battery.customer
+    return {
+        'shop_name': shop_name,
+        'battery_id': battery.battery_id,
+        'inward_date': battery.inward_date.strftime('%d/%m/%Y %H:%M'),
+        'customer_name': customer.name,
+        'customer_mobile': customer.mobile,
+        'customer_mobile_secondary': customer.mobile_secondary,
+        'battery_type': battery.battery_type,
+        'voltage': battery.voltage,
+        'capacity': battery.capacity,
+        'status': battery.status,
+        'is_pickup': battery.is_pickup,
+        'pickup_charge': battery.pickup_charge or 0,
+        'service_price': battery.service_price or 0,
+        'history': [
+            (entry.updated_at.strftime('%d/%m/%Y %H:%M'), entry.status, entry.comments or '-',
+             entry.user.full_name if entry.user else '-')
+            for entry in battery.status_history
+        ]
+    }
+
+
+def _shop_name():
+    return SystemSettings.get_setting('shop_name', 'Battery Repair Service')
+
+
+def render_document(kind, battery):
+    """PDF bytes for one battery's 'receipt' or 'bill', served from the cache when unchanged"""
+    key = (f'battery:{battery.id}', kind)
+    version = document_version(battery)
+    body = document_cache.get(key, version) if version is not None else None
+    if body is None:
+        body = pdf.render(kind, document_data(battery, _shop_name()))
+        if version is not None:
+            document_cache.put(key, version, body)
+    return body
+
+
+def document_filename(kind, battery):
+    prefix = 'BILL-' if kind == 'bill' else 'RECEIPT-'
+    return f'{prefix}{battery.battery_id}.pdf'
+
+
+def bills_query(start, end):
+    """Completed batteries received in [start, end), the ones the period's revenue counts"""
+    return Battery.query.options(
+        joinedload(Battery.customer),
+        selectinload(Battery.status_history).joinedload(BatteryStatusHistory.user)
+    ).filter(
+        Battery.status == 'Ready',
+        Battery.inward_date >= start,
+        Battery.inward_date < end
+    ).order_by(Battery.id)
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only buffer that zipfile fills and the generator drains after each entry"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _render_batch(kind, batteries, shop_name):
+    """Yield ``(battery, pdf)`` in order, reusing cached documents and rendering the rest on the worker pool"""
+    versions = [document_version(battery) for battery in batteries]
+    cached = [
+        document_cache.get((f'battery:{battery.id}', kind), version) if version is not None else None
+        for battery, version in zip(batteries, versions)
+    ]
+    pending = [document_data(battery, shop_name) for battery, body in zip(batteries, cached) if body is None]
+
+    if DOCUMENT_WORKERS > 0 and len(pending) > 1:
+        rendered = _render_pool().map(pdf.render, [kind] * len(pending), pending)
+    else:
+        rendered = (pdf.render(kind, data) for data in pending)
+    for battery, version, body in zip(batteries, versions, cached):
+        if body is None:
+            body = next(rendered)
+            if version is not None:
+                document_cache.put((f'battery:{battery.id}', kind), version, body)
+        yield battery, body
+
+
+def stream_documents_zip(query, kind='bill', batch_size=DOCUMENT_BATCH_SIZE, progress=None):
+    """Yield a ZIP of one PDF per battery in ``query`` as it is built, batch by batch.
+
+    Batteries are fetched ``batch_size`` at a time by id, so memory stays flat
+    for any period. ``progress(count)`` is called after each batch.
+    """
+    # The settings cache is shared by the whole worker, so never fill it from a lagging replica
+    with primary_reads():
+        SystemSettings.check_cache()
+    shop_name = _shop_name()
+    sink = _ZipSink()
+    count = 0
+    last_id = 0
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+        while True:
+            batteries = query.filter(Battery.id > last_id).limit(batch_size).all()
+            if not batteries:
+                break
+            last_id = batteries[-1].id
+            for battery, body in _render_batch(kind, batteries, shop_name):
+                # PDF streams are already deflated, so entries are stored as-is
+                info = zipfile.ZipInfo(document_filename(kind, battery), battery.inward_date.timetuple()[:6])
+                archive.writestr(info, body)
+                yield sink.drain()
+            count += len(batteries)
+            if progress:
+                progress(count)
+    yield sink.drain()
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from app import db
+from models import BatteryEvent
+
+EVENT_POLL_SECONDS = float(os.environ.get('EVENT_POLL_SECONDS', '2'))
+# Streams close after this long and EventSource reconnects with Last-Event-ID;
+# keep it well below the gunicorn worker timeout (WEB_TIMEOUT)
+EVENT_STREAM_MAX_SECONDS = float(os.environ.get('EVENT_STREAM_MAX_SECONDS', '50'))
+# Events are re-read for this long, since transactions can commit out of id order
+EVENT_OVERLAP = timedelta(seconds=float(os.environ.get('EVENT_OVERLAP_SECONDS', '30')))
+# A sync worker would be held for the whole stream, so streams are refused there
+LIVE_UPDATES_ENABLED = os.environ.get('WEB_WORKER_CLASS', 'gthread') != 'sync'
+EVENT_RETENTION = timedelta(days=1)
+# Old events are purged once per this many recorded events in a process
+EVENT_PURGE_EVERY = int(os.environ.get('EVENT_PURGE_EVERY', '500'))
+HEARTBEAT_SECONDS = 15
+
+_recorded_since_purge = 0
+
+
+def record_event(kind, battery, old_status=None):
+    """Add a change-log row for ``battery`` (call before the commit)"""
+    event = BatteryEvent()
+    event.kind = kind
+    event.battery_id = battery.id
+    event.battery_code = battery.battery_id
+    event.status = battery.status
+    event.old_status = old_status
+    db.session.add(event)
+    events_recorded(1)
+    return event
+
+
+def events_recorded(count):
+    """Note ``count`` new events in the current transaction, purging expired ones every EVENT_PURGE_EVERY"""
+    global _recorded_since_purge
+    _recorded_since_purge += count
+    if _recorded_since_purge >= EVENT_PURGE_EVERY:
+        _recorded_since_purge = 0
+        purge_old_events()
+
+
+def purge_old_events():
+    """Delete events older than EVENT_RETENTION (the caller commits); returns how many"""
+    return BatteryEvent.query.filter(
+        BatteryEvent.created_at < datetime.utcnow() - EVENT_RETENTION
+    ).delete(synchronize_session=False)
+
+
+def _event_payload(event):
+    return {
+        'id': event.id,
+        'kind': event.kind,
+        'battery_id': event.battery_id,
+        'battery_code': event.battery_code,
+        'status': event.status,
+        'old_status': event.old_status
+    }
+
+
+def format_sse(payload):
+    return f"id: {payload['id']}\nevent: {payload['kind']}\ndata: {json.dumps(payload)}\n\n"
+
+
+def events_after(last_id, limit=500):
+    """Events after ``last_id`` plus any from the last EVENT_OVERLAP; callers drop ids already sent"""
+    rows = BatteryEvent.query.filter(or_(
+        BatteryEvent.id > last_id,
+        BatteryEvent.created_at >= datetime.utcnow() - EVENT_OVERLAP
+    )).order_by(BatteryEvent.id).limit(limit).all()
+    return [_event_payload(row) for row in rows]
+
+
+def latest_event_id():
+    return db.session.query(db.func.max(BatteryEvent.id)).scalar() or 0
+
+
+class EventBroadcaster:
+    """One polling thread per worker fans change-log rows out to subscriber queues.
+
+    Connected clients never query the database themselves, so the poll cost
+    stays constant no matter how many panels are open.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.last_id = 0
+        # id -> monotonic time published, kept while an event can still be re-read
+        self.published = {}
+
+    def subscribe(self, app):
+        subscriber = queue.Queue(maxsize=1000)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if self.thread is None or not self.thread.is_alive():
+                with app.app_context():
+                    self.last_id = latest_event_id()
+                    # Recent events are already on the pages being opened; don't resend them
+                    now = time.monotonic()
+                    self.published = {payload['id']: now for payload in events_after(self.last_id)}
+                    db.session.remove()
+                self.thread = threading.Thread(target=self._poll, args=(app,), daemon=True, name='event-poller')
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def _publish(self, payloads):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            for payload in payloads:
+                try:
+                    subscriber.put_nowait(payload)
+                except queue.Full:
+                    pass  # Slow client; it resyncs from Last-Event-ID on reconnect
+
+    def _poll(self, app):
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    return
+            try:
+                with app.app_context():
+                    payloads = events_after(self.last_id)
+                    db.session.remove()
+                payloads = [payload for payload in payloads if payload['id'] not in self.published]
+                if payloads:
+                    now = time.monotonic()
+                    for payload in payloads:
+                        self.published[payload['id']] = now
+                    self.last_id = max(self.last_id, payloads[-1]['id'])
+                    self._publish(payloads)
+                cutoff = time.monotonic() - 2 * EVENT_OVERLAP.total_seconds()
+                self.published = {event_id: at for event_id, at in self.published.items() if at > cutoff}
+            except Exception as e:
+                logging.error(f"Event poller error: {e}")
+            time.sleep(EVENT_POLL_SECONDS)
+
+
+broadcaster = EventBroadcaster()
+
+
+def event_stream(app, last_event_id=None):
+    """Yield Server-Sent Events, replaying anything after ``last_event_id`` first.
+
+    The replay overlaps recent events the client may already have; clients
+    skip ids they have seen.
+    """
+    subscriber = broadcaster.subscribe(app)
+    try:
+        yield f"retry: {int(EVENT_POLL_SECONDS * 1000)}\n\n"
+        sent = set()
+        if last_event_id is not None:
+            with app.app_context():
+                missed = events_after(last_event_id)
+                db.session.remove()
+            for payload in missed:
+                sent.add(payload['id'])
+                yield format_sse(payload)
+
+        deadline = time.monotonic() + EVENT_STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                payload = subscriber.get(timeout=HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if payload['id'] not in sent:
+                sent.add(payload['id'])
+                yield format_sse(payload)
+    finally:
+        broadcaster.unsubscribe(subscriber)
@@ -0,0 +1,78 @@
+import csv
+import io
+from app import db
+from models import Customer, Battery, BatteryStatusHistory
+from sqlalchemy import func, select
+
+EXPORT_BATCH_SIZE = 1000
+
+CSV_HEADER = [
+    'Battery ID', 'Customer Name', 'Mobile', 'Battery Type',
+    'Voltage', 'Capacity', 'Status', 'Inward Date',
+    'Service Price', 'Last Updated'
+]
+
+
+def battery_export_statement(date_from=None, date_to=None, status=None):
+    """Select export rows with the last status update from one aggregated subquery"""
+    last_update = select(
+        BatteryStatusHistory.battery_id,
+        func.max(BatteryStatusHistory.updated_at).label('last_updated')
+    ).group_by(BatteryStatusHistory.battery_id).subquery()
+
+    statement = select(
+        Battery.battery_id,
+        Customer.name,
+        Customer.mobile,
+        Battery.battery_type,
+        Battery.voltage,
+        Battery.capacity,
+        Battery.status,
+        Battery.inward_date,
+        Battery.service_price,
+        last_update.c.last_updated
+    ).join(Customer, Battery.customer_id == Customer.id).outerjoin(
+        last_update, last_update.c.battery_id == Battery.id
+    )
+
+    if date_from:
+        statement = statement.where(Battery.inward_date >= date_from)
+    if date_to:
+        statement = statement.where(Battery.inward_date < date_to)
+    if status:
+        statement = statement.where(Battery.status == status)
+    return statement.order_by(Battery.id)
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+def stream_battery_csv(date_from=None, date_to=None, status=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the battery export as CSV text, one chunk per fetched batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue()
+
+    statement = battery_export_statement(date_from, date_to, status)
+    # yield_per streams from a server-side cursor where the driver supports it
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    for batch in result.partitions():
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            writer.writerow([
+                row.battery_id,
+                row.name,
+                row.mobile,
+                row.battery_type,
+                row.voltage,
+                row.capacity,
+                row.status,
+                _format_date(row.inward_date),
+                row.service_price,
+                _format_date(row.last_updated or row.inward_date)
+            ])
+        yield buffer.getvalue()
@@ -0,0 +1,35 @@
+"""
+Gunicorn settings, read from the environment
+
+    WEB_WORKER_CLASS   sync | gthread | gevent   (default gthread)
+    WEB_WORKERS        worker processes          (default 4)
+    WEB_THREADS        threads per gthread worker (default 8)
+    WEB_WORKER_CONNECTIONS  greenlets per gevent worker (default 200)
+    WEB_TIMEOUT        worker timeout in seconds (default 120)
+    PORT               listen port               (default 5000)
+
+sync handles one request per worker. gthread and gevent keep many requests
+(and the /events/stream SSE connections) in flight per worker; size the
+database pool to match, see docker-install.md.
+"""
+import logging
+import os
+
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_WORKERS', '4'))
+threads = int(os.environ.get('WEB_THREADS', '8')) if worker_class == 'gthread' else 1
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', '200'))
+timeout = int(os.environ.get('WEB_TIMEOUT', '120'))
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+
+def post_fork(server, worker):
+    if worker_class != 'gevent':
+        return
+    # psycopg2 blocks the whole gevent hub unless it is made cooperative
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        logging.warning('psycogreen is not installed; database calls will block gevent workers')
+    else:
+        patch_psycopg()
@@ -0,0 +1,181 @@
+import csv
+import io
+from datetime import datetime
+from sqlalchemy import insert
+from app import db
+from models import Customer, Battery, BatteryStatusHistory, BatteryEvent
+from stats import record_batteries_created
+from events import events_recorded
+
+MAX_INTAKE_ROWS = 500
+INTAKE_BATCH_SIZE = 200
+INTAKE_FIELDS = ('customer_name', 'mobile', 'mobile_secondary', 'battery_type',
+                 'voltage', 'capacity', 'is_pickup', 'pickup_charge')
+REQUIRED_FIELDS = ('customer_name', 'mobile', 'battery_type', 'voltage', 'capacity')
+FIELD_LENGTHS = {
+    'customer_name': 100,
+    'mobile': 15,
+    'mobile_secondary': 15,
+    'battery_type': 100,
+    'voltage': 10,
+    'capacity': 10,
+}
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+
+
+class IntakeError(ValueError):
+    """Raised when an intake upload cannot be read at all"""
+
+
+def parse_intake_csv(fileobj):
+    """Read an uploaded CSV into row dicts keyed by the lower-cased header"""
+    try:
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        reader = csv.DictReader(text)
+        if not reader.fieldnames:
+            raise IntakeError('The CSV file is empty.')
+        missing = set(REQUIRED_FIELDS) - {name.strip().lower() for name in reader.fieldnames if name}
+        if missing:
+            raise IntakeError(f'Missing CSV columns: {", ".join(sorted(missing))}')
+        rows = []
+        for row in reader:
+            rows.append({(key or '').strip().lower(): value for key, value in row.items()})
+            if len(rows) > MAX_INTAKE_ROWS:
+                raise IntakeError(f'At most {MAX_INTAKE_ROWS} batteries per upload.')
+        return rows
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise IntakeError(f'Could not read CSV file: {e}')
+
+
+def clean_intake_row(row):
+    """Validate one intake row and return normalized values, or raise ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object')
+
+    values = {}
+    for field, max_length in FIELD_LENGTHS.items():
+        value = row.get(field)
+        value = str(value).strip() if value is not None else ''
+        if len(value) > max_length:
+            raise ValueError(f'{field} is longer than {max_length} characters')
+        values[field] = value
+
+    missing = [field for field in REQUIRED_FIELDS if not values[field]]
+    if missing:
+        raise ValueError(f'Missing {", ".join(missing)}')
+    values['mobile_secondary'] = values['mobile_secondary'] or None
+
+    is_pickup = row.get('is_pickup')
+    values['is_pickup'] = is_pickup is True or str(is_pickup or '').strip().lower() in TRUE_VALUES
+    try:
+        pickup_charge = float(row.get('pickup_charge') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid pickup_charge')
+    if pickup_charge < 0:
+        raise ValueError('Invalid pickup_charge')
+    values['pickup_charge'] = pickup_charge if values['is_pickup'] else 0.0
+    return values
+
+
+def _customer_ids_by_mobile(mobiles):
+    return db.session.query(Customer.mobile, Customer.id).filter(Customer.mobile.in_(mobiles)).order_by(Customer.id)
+
+
+def _resolve_customers(rows):
+    """Map each mobile to a customer id, inserting missing customers in one statement"""
+    mobiles = {row['mobile'] for row in rows}
+    customer_ids = {}
+    # Oldest customer wins, matching the single-entry form's .first() lookup
+    for mobile, customer_id in _customer_ids_by_mobile(mobiles):
+        customer_ids.setdefault(mobile, customer_id)
+
+    new_customers = {}
+    for row in rows:
+        if row['mobile'] not in customer_ids and row['mobile'] not in new_customers:
+            new_customers[row['mobile']] = {
+                'name': row['customer_name'],
+                'mobile': row['mobile'],
+                'mobile_secondary': row['mobile_secondary'],
+                'created_at': datetime.utcnow(),
+            }
+    if new_customers:
+        # Plain executemany, then read the ids back; RETURNING would fall back
+        # to one statement per row on SQLite
+        db.session.execute(insert(Customer), list(new_customers.values()))
+        for mobile, customer_id in _customer_ids_by_mobile(new_customers):
+            customer_ids.setdefault(mobile, customer_id)
+    return customer_ids, len(new_customers)
+
+
+def bulk_intake(rows, user_id, batch_size=INTAKE_BATCH_SIZE):
+    """Register many batteries at once.
+
+    Invalid rows are reported and skipped; valid rows share one customer
+    lookup, one block of battery IDs and multi-row inserts of
+    ``batch_size``. Returns ``{'created': [...], 'errors': [...],
+    'customers_created': n}`` with 1-based row numbers. The caller commits.
+    """
+    if len(rows) > MAX_INTAKE_ROWS:
+        raise IntakeError(f'At most {MAX_INTAKE_ROWS} batteries per upload.')
+
+    valid, errors = [], []
+    for number, row in enumerate(rows, start=1):
+        try:
+            valid.append((number, clean_intake_row(row)))
+        except ValueError as e:
+            errors.append({'row': number, 'error': str(e)})
+    if not valid:
+        return {'created': [], 'errors': errors, 'customers_created': 0}
+
+    customer_ids, customers_created = _resolve_customers([row for _, row in valid])
+    battery_ids = Battery.reserve_battery_ids(len(valid))
+    now = datetime.utcnow()
+
+    created, battery_rows = [], []
+    for start in range(0, len(valid), batch_size):
+        chunk = valid[start:start + batch_size]
+        batteries = []
+        for (number, row), battery_id in zip(chunk, battery_ids[start:start + batch_size]):
+            batteries.append({
+                'battery_id': battery_id,
+                'customer_id': customer_ids[row['mobile']],
+                'battery_type': row['battery_type'],
+                'voltage': row['voltage'],
+                'capacity': row['capacity'],
+                'status': 'Received',
+                'inward_date': now,
+                'service_price': 0.0,
+                'is_pickup': row['is_pickup'],
+                'pickup_charge': row['pickup_charge'],
+            })
+        db.session.execute(insert(Battery), batteries)
+        codes = [battery['battery_id'] for battery in batteries]
+        id_by_code = dict(db.session.query(Battery.battery_id, Battery.id).filter(Battery.battery_id.in_(codes)))
+        ids = [id_by_code[code] for code in codes]
+
+        history, events = [], []
+        for (number, _), battery, new_id in zip(chunk, batteries, ids):
+            pickup_note = " - Pickup service" if battery['is_pickup'] else ""
+            history.append({
+                'battery_id': new_id,
+                'status': 'Received',
+                'comments': f'Battery received from customer{pickup_note} (bulk intake)',
+                'updated_by': user_id,
+                'updated_at': now,
+            })
+            events.append({
+                'kind': 'battery_created',
+                'battery_id': new_id,
+                'battery_code': battery['battery_id'],
+                'status': 'Received',
+                'old_status': None,
+                'created_at': now,
+            })
+            created.append({'row': number, 'id': new_id, 'battery_id': battery['battery_id']})
+        db.session.execute(insert(BatteryStatusHistory), history)
+        db.session.execute(insert(BatteryEvent), events)
+        events_recorded(len(events))
+        battery_rows.extend(batteries)
+
+    record_batteries_created(battery_rows)
+    return {'created': created, 'errors': errors, 'customers_created': customers_created}
@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from models import BackgroundJob
+from replica import replica_reads
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+JOB_RESULT_TTL = timedelta(hours=int(os.environ.get('JOB_RESULT_TTL_HOURS', '24')))
+# How often a worker stamps its jobs as alive and saves their progress
+JOB_HEARTBEAT_SECONDS = int(os.environ.get('JOB_HEARTBEAT_SECONDS', '15'))
+# A job whose worker missed this many heartbeats lost its process (restart, crash, deploy)
+JOB_STALE_AFTER = timedelta(seconds=JOB_HEARTBEAT_SECONDS * 4)
+ACTIVE_JOB_STATUSES = ('queued', 'running')
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+_handlers = {}
+# Live progress for jobs running in this process; the heartbeat copies it to the database
+_progress = {}
+# Jobs queued or running in this process
+_local_jobs = set()
+_heartbeat_thread = None
+_heartbeat_lock = threading.Lock()
+
+
+def job_handler(kind):
+    """Register ``func(job, params, output_path)`` as the handler for a job kind.
+
+    The handler writes its artifact to ``output_path`` and returns
+    ``(download_filename, mimetype)``.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def results_dir():
+    path = os.environ.get('JOB_RESULTS_DIR') or os.path.join(current_app.instance_path, 'jobs')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def report_progress(job_id, message):
+    _progress[job_id] = message
+
+
+def job_progress(job):
+    return _progress.get(job.id, job.progress)
+
+
+def write_heartbeats():
+    """Stamp this process's queued and running jobs as alive and save their latest progress"""
+    job_ids = list(_local_jobs)
+    if not job_ids:
+        return
+    now = datetime.utcnow()
+    table = BackgroundJob.__table__
+    try:
+        # Its own short transaction, so it never commits or waits on a handler's session
+        with db.engine.begin() as connection:
+            for job_id in job_ids:
+                values = {'heartbeat_at': now}
+                if job_id in _progress:
+                    values['progress'] = _progress[job_id]
+                connection.execute(table.update().where(table.c.id == job_id).values(**values))
+    except Exception as e:
+        logging.warning(f"Could not record background job heartbeat: {e}")
+
+
+def _heartbeat_loop(app):
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with app.app_context():
+            write_heartbeats()
+
+
+def _start_heartbeat(app):
+    global _heartbeat_thread
+    with _heartbeat_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, args=(app,), name='job-heartbeat', daemon=True)
+            _heartbeat_thread.start()
+
+
+def fail_stale_jobs():
+    """Mark queued or running jobs whose worker stopped heartbeating as failed; returns how many"""
+    cutoff = datetime.utcnow() - JOB_STALE_AFTER
+    query = BackgroundJob.query.filter(
+        BackgroundJob.status.in_(ACTIVE_JOB_STATUSES),
+        func.coalesce(BackgroundJob.heartbeat_at, BackgroundJob.started_at, BackgroundJob.created_at) < cutoff
+    )
+    local_jobs = list(_local_jobs)
+    if local_jobs:
+        # This process is alive, so its own jobs are too, even if a heartbeat write was missed
+        query = query.filter(BackgroundJob.id.notin_(local_jobs))
+    stale = query.all()
+    for job in stale:
+        job.status = 'failed'
+        job.error = 'The job was interrupted, most likely by a server restart. Please start it again.'
+        job.finished_at = datetime.utcnow()
+    return len(stale)
+
+
+def purge_expired_jobs():
+    """Fail stale jobs, then delete finished job records and artifacts older than JOB_RESULT_TTL"""
+    fail_stale_jobs()
+    cutoff = datetime.utcnow() - JOB_RESULT_TTL
+    for job in BackgroundJob.query.filter(BackgroundJob.finished_at < cutoff).all():
+        for path in (job.result_path, json.loads(job.params).get('input_path')):
+            if path and os.path.exists(path):
+                os.remove(path)
+        db.session.delete(job)
+
+
+def enqueue_job(kind, params, user_id):
+    """Persist a queued job and hand it to the in-process worker pool"""
+    if kind not in _handlers:
+        raise ValueError(f'Unknown job kind: {kind}')
+
+    purge_expired_jobs()
+    job = BackgroundJob()
+    job.id = uuid.uuid4().hex
+    job.kind = kind
+    job.params = json.dumps(params)
+    job.created_by = user_id
+    job.heartbeat_at = datetime.utcnow()
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    _local_jobs.add(job.id)
+    _start_heartbeat(app)
+    _executor.submit(_run_job, app, job.id, results_dir())
+    return job
+
+
+def _run_job(app, job_id, output_dir):
+    try:
+        _execute_job(app, job_id, output_dir)
+    finally:
+        _local_jobs.discard(job_id)
+
+
+def _execute_job(app, job_id, output_dir):
+    with app.app_context():
+        job = db.session.get(BackgroundJob, job_id)
+        job.status = 'running'
+        job.started_at = job.heartbeat_at = datetime.utcnow()
+        db.session.commit()
+
+        output_path = os.path.join(output_dir, job_id)
+        try:
+            filename, mimetype = _handlers[job.kind](job, json.loads(job.params), output_path)
+            db.session.commit()
+            job.status = 'finished'
+            job.result_path = output_path
+            job.result_filename = filename
+            job.result_mimetype = mimetype
+        except Exception as e:
+            logging.exception(f"Background job {job_id} ({job.kind}) failed")
+            db.session.rollback()
+            job = db.session.get(BackgroundJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        job.progress = _progress.pop(job_id, job.progress)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        db.session.remove()
+
+
+def job_status(job):
+    """Compact JSON-serializable view of a job for polling clients"""
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job_progress(job),
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+@job_handler('export_csv')
+def _export_csv_job(job, params, output_path):
+    from exports import stream_battery_csv
+    date_from = datetime.fromisoformat(params['date_from']) if params.get('date_from') else None
+    date_to = datetime.fromisoformat(params['date_to']) if params.get('date_to') else None
+    with replica_reads(), open(output_path, 'w', newline='', encoding='utf-8') as output:
+        for chunk in stream_battery_csv(date_from, date_to, params.get('status')):
+            output.write(chunk)
+    return f'battery_records_{job.created_at.strftime("%Y%m%d_%H%M%S")}.csv', 'text/csv'
+
+
+@job_handler('backup')
+def _backup_job(job, params, output_path):
+    from backup import stream_backup, gzip_stream
+    filename = f'battery_erp_backup_{job.created_at.strftime("%Y%m%d_%H%M%S")}.jsonl'
+    if params.get('compress') == 'gzip':
+        with replica_reads(), open(output_path, 'wb') as output:
+            for chunk in gzip_stream(stream_backup()):
+                output.write(chunk)
+        return filename + '.gz', 'application/gzip'
+    with replica_reads(), open(output_path, 'w', encoding='utf-8') as output:
+        for chunk in stream_backup():
+            output.write(chunk)
+    return filename, 'application/x-ndjson'
+
+
+@job_handler('restore')
+def _restore_job(job, params, output_path):
+    from backup import open_backup, restore_backup
+
+    def progress(table, count):
+        report_progress(job.id, f'{count} {table} rows restored')
+
+    with open(params['input_path'], 'rb') as backup_file:
+        records = open_backup(backup_file, params['filename'])
+        counts = restore_backup(records, params['admin_id'], params['admin_username'], progress=progress)
+    db.session.commit()
+    from user_cache import user_cache
+    user_cache.invalidate()
+    with open(output_path, 'w', encoding='utf-8') as output:
+        json.dump(counts, output)
+    os.remove(params['input_path'])
+    return 'restore_summary.json', 'application/json'
+
+
+@job_handler('yearly_report')
+def _yearly_report_job(job, params, output_path):
+    from reports import yearly_summary
+    with replica_reads():
+        summary = yearly_summary(params['year'])
+    summary.pop('buckets')
+    summary['year'] = params['year']
+    with open(output_path, 'w', encoding='utf-8') as output:
+        json.dump(summary, output, indent=2)
+    return f'yearly_report_{params["year"]}.json', 'application/json'
+
+
+@job_handler('bills_zip')
+def _bills_zip_job(job, params, output_path):
+    from documents import bills_query, stream_documents_zip
+    from reports import period_bounds
+    start, end = period_bounds(params['year'], params.get('month'))
+
+    def progress(count):
+        report_progress(job.id, f'{count} bills rendered')
+
+    with replica_reads(), open(output_path, 'wb') as output:
+        for chunk in stream_documents_zip(bills_query(start, end), progress=progress):
+            output.write(chunk)
+    period = start.strftime('%Y_%m') if params.get('month') else str(params['year'])
+    return f'bills_{period}.zip', 'application/zip'
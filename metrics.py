@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from flask import Blueprint, Response, g, has_request_context, request, before_render_template, template_rendered
+from flask import abort
+from flask_login import login_required, current_user
+from sqlalchemy import event
+
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '1000'))
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_SAMPLES = 50
+
+# Prometheus-style cumulative buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+class Histogram:
+    """Fixed-bucket histogram that renders in Prometheus text format"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += 1
+        self.sum += value
+
+    def render(self, name, labels):
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.total}')
+        return lines
+
+
+class MetricsRegistry:
+    """Per-process request, query and template metrics"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_latency = {}
+        self.request_queries = {}
+        self.template_latency = {}
+        self.responses = {}
+        self.slow_queries = deque(maxlen=SLOW_QUERY_SAMPLES)
+
+    def _histogram(self, store, key, buckets):
+        if key not in store:
+            store[key] = Histogram(buckets)
+        return store[key]
+
+    def record_request(self, endpoint, method, status, seconds, queries):
+        with self.lock:
+            self._histogram(self.request_latency, (endpoint, method), LATENCY_BUCKETS).observe(seconds)
+            self._histogram(self.request_queries, (endpoint, method), QUERY_COUNT_BUCKETS).observe(queries)
+            key = (endpoint, method, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def record_template(self, template, seconds):
+        with self.lock:
+            self._histogram(self.template_latency, template, LATENCY_BUCKETS).observe(seconds)
+
+    def record_slow_query(self, endpoint, statement, milliseconds):
+        self.slow_queries.append((endpoint, ' '.join(statement.split())[:300], round(milliseconds, 2)))
+
+    def render(self):
+        lines = [
+            '# HELP http_request_duration_seconds Request latency by endpoint',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        with self.lock:
+            for (endpoint, method), histogram in sorted(self.request_latency.items()):
+                lines += histogram.render('http_request_duration_seconds', f'endpoint="{endpoint}",method="{method}"')
+            lines += [
+                '# HELP http_request_sql_queries SQL statements issued per request',
+                '# TYPE http_request_sql_queries histogram',
+            ]
+            for (endpoint, method), histogram in sorted(self.request_queries.items()):
+                lines += histogram.render('http_request_sql_queries', f'endpoint="{endpoint}",method="{method}"')
+            lines += [
+                '# HELP template_render_duration_seconds Jinja render time by template',
+                '# TYPE template_render_duration_seconds histogram',
+            ]
+            for template, histogram in sorted(self.template_latency.items()):
+                lines += histogram.render('template_render_duration_seconds', f'template="{template}"')
+            lines += [
+                '# HELP http_responses_total Responses by endpoint and status code',
+                '# TYPE http_responses_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self.responses.items()):
+                lines.append(f'http_responses_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+            lines += [
+                f'# HELP sql_slow_query_milliseconds Recent statements slower than {SLOW_QUERY_MS:g} ms',
+                '# TYPE sql_slow_query_milliseconds gauge',
+            ]
+            for endpoint, statement, milliseconds in self.slow_queries:
+                statement = statement.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'sql_slow_query_milliseconds{{endpoint="{endpoint}",statement="{statement}"}} {milliseconds}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['query_start_time'].pop()) * 1000
+    endpoint = None
+    if has_request_context():
+        g.sql_queries = g.get('sql_queries', 0) + 1
+        endpoint = _endpoint()
+    if elapsed_ms >= SLOW_QUERY_MS:
+        registry.record_slow_query(endpoint or 'background', statement, elapsed_ms)
+
+
+def _before_render(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    started = g.pop('template_started', None)
+    if started is not None:
+        registry.record_template(template.name or 'string', time.perf_counter() - started)
+
+
+def init_metrics(app, engines):
+    """Attach SQL (on every engine, replica included), template and request instrumentation to the app"""
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.sql_queries = 0
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        if started is None or request.endpoint == 'static':
+            return response
+        seconds = time.perf_counter() - started
+        queries = g.get('sql_queries', 0)
+        registry.record_request(_endpoint(), request.method, response.status_code, seconds, queries)
+        if seconds * 1000 >= SLOW_REQUEST_MS:
+            logging.warning(
+                f"Slow request {request.method} {request.path} ({_endpoint()}): "
+                f"{seconds * 1000:.0f} ms, {queries} queries"
+            )
+        return response
+
+
+@metrics_bp.route('/metrics')
+@login_required
+def metrics():
+    if current_user.role != 'admin':
+        abort(403)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -1,109 +1,47 @@
 #!/usr/bin/env python3
 """
-Database initialization script
+Database migration script
+
+Applies pending schema migrations in place, on PostgreSQL or SQLite,
+without dropping any data. Uses DATABASE_URL like the application.
+
+    python migrate_db.py             # apply all pending migrations
+    python migrate_db.py --status    # list applied and pending migrations
+    python migrate_db.py --to 1      # apply migrations up to version 1
 """
-import os
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager
-from sqlalchemy.orm import DeclarativeBase
-from werkzeug.security import generate_password_hash
+import argparse
 import logging
 
+from app import create_app, db
+from migrations import MIGRATIONS, applied_versions, upgrade
+
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=logging.INFO)
+
 
-class Base(DeclarativeBase):
-    pass
+def main():
+    parser = argparse.ArgumentParser(description='Apply database schema migrations')
+    parser.add_argument('--status', action='store_true', help='list applied and pending migrations')
+    parser.add_argument('--to', type=int, default=None, help='stop after this migration version')
+    args = parser.parse_args()
 
-# Create Flask app for migration
-migration_app = Flask(__name__)
-migration_app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///battery_repair.db"
-migration_app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if args.status:
+            applied = applied_versions(db.engine)
+            for version, name, _func in MIGRATIONS:
+                state = 'applied' if version in applied else 'pending'
+                print(f"{version:04d}  {state:8s} {name}")
+            return
 
-migration_db = SQLAlchemy(model_class=Base)
-migration_db.init_app(migration_app)
+        done = upgrade(db.engine, target=args.to)
+        if done:
+            for version, name in done:
+                print(f"Applied {version:04d} {name}")
+        else:
+            print("Database schema is up to date")
 
-# Import models after db is set up
-with migration_app.app_context():
-    from datetime import datetime
-    
-    class User(migration_db.Model):
-        id = migration_db.Column(migration_db.Integer, primary_key=True)
-        username = migration_db.Column(migration_db.String(64), unique=True, nullable=False)
-        password_hash = migration_db.Column(migration_db.String(256), nullable=False)
-        role = migration_db.Column(migration_db.String(20), nullable=False)
-        full_name = migration_db.Column(migration_db.String(100), nullable=False)
-        created_at = migration_db.Column(migration_db.DateTime, default=datetime.utcnow)
-        is_active = migration_db.Column(migration_db.Boolean, default=True)
 
-    class SystemSettings(migration_db.Model):
-        id = migration_db.Column(migration_db.Integer, primary_key=True)
-        setting_key = migration_db.Column(migration_db.String(50), unique=True, nullable=False)
-        setting_value = migration_db.Column(migration_db.Text, nullable=False)
-        updated_at = migration_db.Column(migration_db.DateTime, default=datetime.utcnow)
-    
-    # Remove old database if exists
-    db_path = 'battery_repair.db'
-    if os.path.exists(db_path):
-        os.remove(db_path)
-        print(f"Removed old database: {db_path}")
-    
-    # Create all tables
-    migration_db.create_all()
-    print("Created all database tables with new schema")
-    
-    # Create default users
-    try:
-        admin_user = User(
-            username='admin',
-            password_hash=generate_password_hash('admin123'),
-            role='admin',
-            full_name='Administrator',
-            is_active=True
-        )
-        migration_db.session.add(admin_user)
-        
-        staff_user = User(
-            username='staff',
-            password_hash=generate_password_hash('staff123'),
-            role='shop_staff',
-            full_name='Shop Staff',
-            is_active=True
-        )
-        migration_db.session.add(staff_user)
-        
-        tech_user = User(
-            username='technician',
-            password_hash=generate_password_hash('tech123'),
-            role='technician',
-            full_name='Technician',
-            is_active=True
-        )
-        migration_db.session.add(tech_user)
-        
-        # Initialize system settings
-        default_settings = [
-            ('shop_name', 'Battery Repair Service'),
-            ('battery_id_prefix', 'BAT'),
-            ('battery_id_start', '1'),
-            ('battery_id_padding', '4')
-        ]
-        
-        for key, value in default_settings:
-            setting = SystemSettings(setting_key=key, setting_value=value)
-            migration_db.session.add(setting)
-        
-        migration_db.session.commit()
-        print("Successfully created default users and settings!")
-        print("Default logins:")
-        print("  Admin: username='admin', password='admin123'")
-        print("  Staff: username='staff', password='staff123'")
-        print("  Technician: username='technician', password='tech123'")
-        
-    except Exception as e:
-        print(f"Error creating users: {e}")
-        migration_db.session.rollback()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+MIGRATIONS = []
+
+SCHEMA_MIGRATIONS_DDL = (
+    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+    "version INTEGER PRIMARY KEY, "
+    "name VARCHAR(100) NOT NULL, "
+    "applied_at TIMESTAMP NOT NULL)"
+)
+
+# Same expression as models.mobile_digits, so the planner matches it to the index
+MOBILE_DIGITS_SQL = "replace(replace(replace(mobile, ' ', ''), '-', ''), '+', '')"
+
+
+def migration(version, name):
+    """Register ``func(connection, dialect_name)`` as schema migration ``version``"""
+    def decorator(func):
+        MIGRATIONS.append((version, name, func))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+    return decorator
+
+
+def _create_index(connection, name, table, columns):
+    connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+@migration(1, 'search indexes')
+def _search_indexes(connection, dialect_name):
+    _create_index(connection, 'ix_customer_mobile', 'customer', 'mobile')
+    _create_index(connection, 'ix_customer_mobile_digits', 'customer', MOBILE_DIGITS_SQL)
+    _create_index(connection, 'ix_customer_name_folded', 'customer', 'lower(name)')
+    _create_index(connection, 'ix_battery_customer_id', 'battery', 'customer_id')
+
+    if dialect_name == 'postgresql':
+        # pg_trgm may not be installable (no superuser); search falls back to prefix matching
+        try:
+            with connection.begin_nested():
+                connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                connection.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_customer_name_trgm "
+                    "ON customer USING gin (lower(name) gin_trgm_ops)"
+                ))
+        except Exception as e:
+            logging.warning(f"Trigram search index unavailable, using prefix search only: {e}")
+
+
+@migration(2, 'hot query indexes')
+def _hot_query_indexes(connection, dialect_name):
+    _create_index(connection, 'ix_battery_status_inward_date', 'battery', 'status, inward_date')
+    _create_index(connection, 'ix_battery_inward_date', 'battery', 'inward_date')
+    _create_index(connection, 'ix_status_history_battery_updated', 'battery_status_history', 'battery_id, updated_at')
+    _create_index(connection, 'ix_status_history_updated_at', 'battery_status_history', 'updated_at')
+
+
+@migration(3, 'replace status summary with daily rollup')
+def _daily_rollup(connection, dialect_name):
+    from models import BatteryDailyRollup
+    from stats import daily_rollup_select
+    # Backfill here, before any write can add a partial row; the read path never rebuilds
+    table = BatteryDailyRollup.__table__
+    table.create(connection, checkfirst=True)
+    connection.execute(table.delete())
+    connection.execute(table.insert().from_select(
+        ['day', 'status', 'battery_count', 'service_revenue', 'pickup_revenue'], daily_rollup_select()
+    ))
+    connection.execute(text("DROP TABLE IF EXISTS battery_status_summary"))
+
+
+@migration(4, 'pattern search indexes')
+def _pattern_search_indexes(connection, dialect_name):
+    if dialect_name != 'postgresql':
+        return
+    # Outside the C locale PostgreSQL only uses a B-tree for LIKE 'prefix%' with pattern ops
+    _create_index(connection, 'ix_customer_mobile_digits_pattern', 'customer',
+                  f"({MOBILE_DIGITS_SQL}) text_pattern_ops")
+    _create_index(connection, 'ix_customer_name_folded_pattern', 'customer', 'lower(name) text_pattern_ops')
+    _create_index(connection, 'ix_battery_battery_id_pattern', 'battery', 'battery_id varchar_pattern_ops')
+    try:
+        with connection.begin_nested():
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_customer_mobile_digits_trgm "
+                f"ON customer USING gin (({MOBILE_DIGITS_SQL}) gin_trgm_ops)"
+            ))
+    except Exception as e:
+        logging.warning(f"Trigram mobile index unavailable, substring mobile search will scan: {e}")
+
+
+@migration(5, 'background job heartbeat')
+def _job_heartbeat(connection, dialect_name):
+    columns = {column['name'] for column in inspect(connection).get_columns('background_job')}
+    if 'heartbeat_at' not in columns:
+        connection.execute(text("ALTER TABLE background_job ADD COLUMN heartbeat_at TIMESTAMP"))
+
+
+def applied_versions(engine):
+    with engine.begin() as connection:
+        connection.execute(text(SCHEMA_MIGRATIONS_DDL))
+        return {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending_migrations(engine):
+    applied = applied_versions(engine)
+    return [(version, name) for version, name, _func in MIGRATIONS if version not in applied]
+
+
+def upgrade(engine, target=None):
+    """Apply pending migrations in order, each in its own transaction.
+
+    Returns the list of (version, name) applied. Safe to run from several
+    workers at once: DDL is idempotent and a version recorded by another
+    worker is skipped.
+    """
+    applied = applied_versions(engine)
+    done = []
+    for version, name, func in MIGRATIONS:
+        if version in applied or (target is not None and version > target):
+            continue
+        try:
+            with engine.begin() as connection:
+                func(connection, engine.dialect.name)
+                connection.execute(
+                    text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                    {'version': version, 'name': name, 'applied_at': datetime.utcnow()}
+                )
+        except IntegrityError:
+            logging.info(f"Migration {version} was applied by another process")
+            continue
+        logging.info(f"Applied migration {version}: {name}")
+        done.append((version, name))
+    return done
@@ -1,7 +1,8 @@
 from app import db
 from flask_login import UserMixin
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import event, func, literal_column
+from sqlalchemy.orm import Session
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -41,24 +42,107 @@ class Battery(db.Model):
     @staticmethod
     def generate_next_battery_id():
         """Generate the next sequential battery ID using system settings"""
-        from app import db
+        return Battery.reserve_battery_ids(1)[0]
+    
+    @staticmethod
+    def reserve_battery_ids(count):
+        """Reserve ``count`` consecutive battery IDs from the persistent counter"""
+        prefix = SystemSettings.get_setting('battery_id_prefix', 'BAT')
+        padding = int(SystemSettings.get_setting('battery_id_padding', '4'))
         
+        end = BatteryIdCounter.allocate(count)
+        return [f"{prefix}{number:0{padding}d}" for number in range(end - count, end)]
+
+class BatteryIdCounter(db.Model):
+    """Row-locked counter holding the next battery number to hand out"""
+    name = db.Column(db.String(30), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False)
+    
+    BATTERY_ID = 'battery_id'
+    
+    @staticmethod
+    def _next_for_prefix(prefix, start_num):
+        """One past the highest existing number under ``prefix``, and at least ``start_num``"""
+        # Half-open range over the unique battery_id index; zero padding makes
+        # the longest, then greatest, ID the highest number
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
+        query = db.session.query(Battery.battery_id).filter(Battery.battery_id >= prefix)
+        if upper:
+            query = query.filter(Battery.battery_id < upper)
+        ordered = query.order_by(func.length(Battery.battery_id).desc(), Battery.battery_id.desc())
+        for (battery_id,) in ordered.yield_per(100):
+            suffix = battery_id[len(prefix):]
+            if battery_id.startswith(prefix) and suffix.isdigit():
+                return max(int(suffix) + 1, start_num)
+        return start_num
+    
+    @staticmethod
+    def _initial_value():
+        # One-time scan when the counter row does not exist yet
         prefix = SystemSettings.get_setting('battery_id_prefix', 'BAT')
         start_num = int(SystemSettings.get_setting('battery_id_start', '1'))
-        padding = int(SystemSettings.get_setting('battery_id_padding', '4'))
+        return BatteryIdCounter._next_for_prefix(prefix, start_num)
+    
+    @staticmethod
+    def _ensure_row():
+        from sqlalchemy.exc import IntegrityError
         
-        last_battery = Battery.query.order_by(Battery.id.desc()).first()
-        if last_battery:
-            # Extract number from last battery ID (e.g., BAT0001 -> 1)
-            try:
-                last_num = int(last_battery.battery_id[len(prefix):])
-                next_num = last_num + 1
-            except (ValueError, IndexError):
-                next_num = start_num
-        else:
-            next_num = start_num
+        if db.session.get(BatteryIdCounter, BatteryIdCounter.BATTERY_ID) is not None:
+            return
+        try:
+            with db.session.begin_nested():
+                counter = BatteryIdCounter()
+                counter.name = BatteryIdCounter.BATTERY_ID
+                counter.next_value = BatteryIdCounter._initial_value()
+                db.session.add(counter)
+        except IntegrityError:
+            pass  # Another worker created it first
+    
+    @staticmethod
+    def allocate(count=1):
+        """Advance the counter by ``count`` and return the new (exclusive) end value.
         
-        return f"{prefix}{next_num:0{padding}d}"
+        The UPDATE takes a row lock on PostgreSQL and the write lock on SQLite,
+        so concurrent intakes get disjoint blocks until the transaction ends.
+        """
+        table = BatteryIdCounter.__table__
+        statement = table.update().where(table.c.name == BatteryIdCounter.BATTERY_ID).values(
+            next_value=table.c.next_value + count
+        )
+        if db.session.execute(statement).rowcount == 0:
+            BatteryIdCounter._ensure_row()
+            db.session.execute(statement)
+        return db.session.execute(
+            db.select(table.c.next_value).where(table.c.name == BatteryIdCounter.BATTERY_ID)
+        ).scalar_one()
+    
+    @staticmethod
+    def sync_with_settings(old_prefix, new_prefix, start_num):
+        """Apply prefix and start changes from admin settings; a new prefix reads only its own IDs"""
+        BatteryIdCounter._ensure_row()
+        counter = db.session.get(BatteryIdCounter, BatteryIdCounter.BATTERY_ID)
+        if old_prefix != new_prefix:
+            # Switching back to a prefix used before continues its series
+            counter.next_value = BatteryIdCounter._next_for_prefix(new_prefix, start_num)
+        elif start_num > counter.next_value:
+            counter.next_value = start_num
+
+def mobile_digits(column):
+    """SQL expression stripping common separators from a mobile number.
+
+    The separators are inlined as SQL literals rather than bound parameters so
+    the expression matches ``ix_customer_mobile_digits`` and SQLite can use it.
+    """
+    expression = column
+    for separator in (' ', '-', '+'):
+        expression = func.replace(expression, literal_column(f"'{separator}'"), literal_column("''"))
+    return expression
+
+# Search indexes: mobile prefix, normalized digits, case-folded name, owner lookup
+db.Index('ix_customer_mobile', Customer.mobile)
+db.Index('ix_customer_mobile_digits', mobile_digits(Customer.mobile))
+db.Index('ix_customer_name_folded', func.lower(Customer.name))
+db.Index('ix_battery_customer_id', Battery.customer_id)
 
 class BatteryStatusHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -71,16 +155,54 @@ class BatteryStatusHistory(db.Model):
     # Relationship
     user = db.relationship('User', backref='status_updates')
 
+# Hot query indexes; existing databases get these from migrations.py
+db.Index('ix_battery_status_inward_date', Battery.status, Battery.inward_date)
+db.Index('ix_battery_inward_date', Battery.inward_date)
+db.Index('ix_status_history_battery_updated', BatteryStatusHistory.battery_id, BatteryStatusHistory.updated_at)
+db.Index('ix_status_history_updated_at', BatteryStatusHistory.updated_at)
+
+class SettingsVersion(db.Model):
+    """Single-row counter bumped on every settings write; workers compare it to their cache"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+
 class SystemSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     setting_key = db.Column(db.String(50), unique=True, nullable=False)
     setting_value = db.Column(db.Text, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Per-process cache: {'version': int or None, 'values': {key: value}}
+    _cache = {'version': None, 'values': None}
+    
+    @staticmethod
+    def check_cache():
+        """Reload all settings in one query if another worker changed them"""
+        version = db.session.query(SettingsVersion.version).filter_by(id=1).scalar() or 0
+        cache = SystemSettings._cache
+        if cache['values'] is None or cache['version'] != version:
+            values = dict(db.session.query(SystemSettings.setting_key, SystemSettings.setting_value).all())
+            if db.session.info.get('settings_changed'):
+                # Uncommitted values; re-check once this transaction has ended
+                version = None
+            SystemSettings._cache = {'version': version, 'values': values}
+    
+    @staticmethod
+    def bump_version():
+        """Mark settings as changed for every worker (call inside the writing transaction)"""
+        table = SettingsVersion.__table__
+        result = db.session.execute(table.update().where(table.c.id == 1).values(version=table.c.version + 1))
+        if result.rowcount == 0:
+            db.session.execute(table.insert().values(id=1, version=1))
+        # This worker reloads on its next read; a rollback drops whatever it read meanwhile
+        db.session.info['settings_changed'] = True
+        SystemSettings._cache = {'version': None, 'values': None}
+    
     @staticmethod
     def get_setting(key, default_value=''):
-        setting = SystemSettings.query.filter_by(setting_key=key).first()
-        return setting.setting_value if setting else default_value
+        if SystemSettings._cache['values'] is None:
+            SystemSettings.check_cache()
+        return SystemSettings._cache['values'].get(key, default_value)
     
     @staticmethod
     def set_setting(key, value):
@@ -94,4 +216,50 @@ class SystemSettings(db.Model):
             setting.setting_value = value
             from app import db
             db.session.add(setting)
+        
+        SystemSettings.bump_version()
         return setting
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_rolled_back_settings(session):
+    if session.info.get('settings_changed'):
+        SystemSettings._cache = {'version': None, 'values': None}
+
+@event.listens_for(Session, 'after_transaction_end')
+def _end_settings_change(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('settings_changed', None)
+
+class BatteryDailyRollup(db.Model):
+    """Materialized counters per inward day and current status, kept in step with the battery table"""
+    day = db.Column(db.Date, primary_key=True)  # date part of Battery.inward_date
+    status = db.Column(db.String(20), primary_key=True)
+    battery_count = db.Column(db.Integer, default=0, nullable=False)
+    service_revenue = db.Column(db.Float, default=0.0, nullable=False)
+    pickup_revenue = db.Column(db.Float, default=0.0, nullable=False)
+
+class BackgroundJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(30), nullable=False)  # 'backup', 'export_csv', 'restore', 'yearly_report'
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, running, finished, failed
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    progress = db.Column(db.String(200))
+    error = db.Column(db.Text)
+    result_path = db.Column(db.String(255))
+    result_filename = db.Column(db.String(100))
+    result_mimetype = db.Column(db.String(50))
+    created_by = db.Column(db.Integer, nullable=False)  # user id; no FK so restores can replace users
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # last time the owning worker reported the job alive
+    finished_at = db.Column(db.DateTime)
+
+class BatteryEvent(db.Model):
+    """Change log read by every worker to fan out live updates"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # 'battery_created' or 'status_changed'
+    battery_id = db.Column(db.Integer, nullable=False)  # battery.id; no FK so restores can clear batteries
+    battery_code = db.Column(db.String(20), nullable=False)  # BAT0001
+    status = db.Column(db.String(20), nullable=False)
+    old_status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
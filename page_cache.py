@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timezone
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import func
+from app import db
+from models import BatteryStatusHistory, SystemSettings
+from events import latest_event_id
+
+PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', '256'))
+
+_template_version = None
+
+
+class RenderedPageCache:
+    """Thread-safe LRU of rendered HTML, each entry valid for exactly one ETag"""
+
+    def __init__(self, max_size=PAGE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, etag, body):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_battery(self, battery_id):
+        """Drop every page rendered for one battery (receipt, bill, details)"""
+        scope = f'battery:{battery_id}'
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == scope]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+page_cache = RenderedPageCache()
+
+
+def _templates_version():
+    # Template edits change every ETag, so deploys never serve stale markup
+    global _template_version
+    if _template_version is None:
+        folder = os.path.join(current_app.root_path, current_app.template_folder)
+        mtimes = [os.path.getmtime(os.path.join(root, name)) for root, _dirs, files in os.walk(folder) for name in files]
+        _template_version = str(max(mtimes, default=0))
+    return _template_version
+
+
+def battery_validator(battery_id):
+    """Pages for one battery change only when a status history row is added"""
+    updated_at, count = db.session.query(
+        func.max(BatteryStatusHistory.updated_at),
+        func.count(BatteryStatusHistory.id)
+    ).filter(BatteryStatusHistory.battery_id == battery_id).one()
+    if not count:
+        return None
+    return f'battery:{battery_id}', [updated_at.isoformat(), count], updated_at
+
+
+def report_validator(**_kwargs):
+    """Report pages change with every intake or status change, both of which log an event"""
+    return 'report', [latest_event_id(), date.today().isoformat()], None
+
+
+def _not_modified(etag, last_modified):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def cached_page(validator):
+    """Serve a page with ETag/Last-Modified, ETag-matched 304s and a server-side HTML cache.
+
+    ``validator(**view_kwargs)`` returns ``(scope, version_parts,
+    last_modified)`` from a cheap query, or None to bypass caching. The ETag
+    also covers the user, URL, settings version and templates. Only HTML is
+    kept server-side, and nothing is cached while flash messages are pending.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            settings_version = SystemSettings._cache['version']
+            found = validator(**kwargs) if settings_version is not None and not session.get('_flashes') else None
+            if found is None:
+                return view(*args, **kwargs)
+
+            scope, parts, last_modified = found
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+            signature = [scope, *parts, settings_version, current_user.id, request.full_path, _templates_version()]
+            etag = hashlib.sha1('|'.join(str(part) for part in signature).encode()).hexdigest()
+
+            # Only the ETag covers the user, settings and templates; If-Modified-Since alone
+            # would answer 304 after any of those changed, so it is not honoured
+            if request.if_none_match.contains(etag):
+                return _not_modified(etag, last_modified)
+
+            key = (scope, current_user.id, request.full_path)
+            body = page_cache.get(key, etag)
+            if body is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or session.get('_flashes'):
+                    return response
+                if response.mimetype == 'text/html':
+                    page_cache.put(key, etag, response.get_data())
+            else:
+                response = make_response(body)
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Browsers keep the page but revalidate on every open
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,78 @@
+from models import Battery
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 50
+
+
+class KeysetPage:
+    """One page of batteries with opaque cursors for the neighbouring pages"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(battery):
+    return f"{battery.inward_date.isoformat()}_{battery.id}"
+
+
+def decode_cursor(cursor):
+    """Parse a cursor back into (inward_date, id); returns None if malformed"""
+    try:
+        inward_date, record_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(inward_date), int(record_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _after(key, descending):
+    inward_date, record_id = key
+    if descending:
+        return (Battery.inward_date < inward_date) | (
+            (Battery.inward_date == inward_date) & (Battery.id < record_id))
+    return (Battery.inward_date > inward_date) | (
+        (Battery.inward_date == inward_date) & (Battery.id > record_id))
+
+
+def _ordering(descending):
+    if descending:
+        return [Battery.inward_date.desc(), Battery.id.desc()]
+    return [Battery.inward_date.asc(), Battery.id.asc()]
+
+
+def paginate_batteries(query, after=None, before=None, per_page=DEFAULT_PAGE_SIZE, descending=False):
+    """Keyset-paginate a Battery query on (inward_date, id).
+
+    ``after`` returns the page following that cursor, ``before`` the page
+    preceding it. Only ``per_page + 1`` rows are fetched per call.
+    """
+    after_key = decode_cursor(after) if after else None
+    before_key = decode_cursor(before) if before else None
+
+    if before_key is not None:
+        # Walk backwards in reverse order, then flip the rows back
+        rows = query.filter(_after(before_key, not descending)).order_by(
+            *_ordering(not descending)).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        prev_cursor = encode_cursor(items[0]) if has_more and items else None
+        next_cursor = encode_cursor(items[-1]) if items else None
+        return KeysetPage(items, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+    if after_key is not None:
+        query = query.filter(_after(after_key, descending))
+    rows = query.order_by(*_ordering(descending)).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    next_cursor = encode_cursor(items[-1]) if has_more and items else None
+    prev_cursor = encode_cursor(items[0]) if after_key is not None and items else None
+    return KeysetPage(items, next_cursor=next_cursor, prev_cursor=prev_cursor)
@@ -0,0 +1,248 @@
+"""
+Minimal pure-Python PDF writer and the receipt/bill layouts
+
+Uses the standard Helvetica fonts with WinAnsi encoding, so no font files
+or third-party packages are needed. Layout functions take plain dicts
+(see documents.document_data) and return PDF bytes, which keeps them
+importable by worker processes without the Flask app.
+"""
+import zlib
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+
+# Advance widths (1/1000 em) for ASCII 32-126, from the standard Helvetica AFM files
+_HELVETICA = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584
+)
+_HELVETICA_BOLD = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584
+)
+
+
+def text_width(text, size, bold=False):
+    widths = _HELVETICA_BOLD if bold else _HELVETICA
+    return sum(widths[ord(char) - 32] if 32 <= ord(char) <= 126 else 556 for char in text) * size / 1000
+
+
+def wrap_text(text, width, size, bold=False):
+    """Split text into lines no wider than ``width`` points, breaking at spaces"""
+    lines = []
+    for paragraph in str(text).splitlines() or ['']:
+        line = ''
+        for word in paragraph.split(' '):
+            candidate = f'{line} {word}' if line else word
+            if line and text_width(candidate, size, bold) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def _pdf_string(text):
+    encoded = str(text).encode('cp1252', errors='replace')
+    return b'(' + encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class PdfPage:
+    """One page of drawing operators; y grows upwards from the bottom edge"""
+
+    def __init__(self):
+        self.ops = []
+
+    def text(self, x, y, text, size=10, bold=False, align='left'):
+        if align == 'right':
+            x -= text_width(text, size, bold)
+        elif align == 'center':
+            x -= text_width(text, size, bold) / 2
+        font = b'/F2' if bold else b'/F1'
+        self.ops.append(b'BT %s %d Tf %.2f %.2f Td %s Tj ET' % (font, size, x, y, _pdf_string(text)))
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self.ops.append(b'%.2f w %.2f %.2f m %.2f %.2f l S' % (width, x1, y1, x2, y2))
+
+
+class PdfDocument:
+    """Flows lines of text down A4 pages, starting a new page when one fills up"""
+
+    def __init__(self, title=''):
+        self.title = title
+        self.pages = []
+        self.y = 0
+        self.new_page()
+
+    def new_page(self):
+        self.page = PdfPage()
+        self.pages.append(self.page)
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def space(self, height):
+        if self.y - height < MARGIN:
+            self.new_page()
+        else:
+            self.y -= height
+
+    def text(self, text, size=10, bold=False, x=MARGIN, align='left', leading=None):
+        self.space(leading or size * 1.4)
+        self.page.text(x, self.y, text, size, bold, align)
+
+    def row(self, cells, size=9, bold=False):
+        """Draw ``(x, width, text)`` cells on one row, wrapping each cell within its width"""
+        wrapped = [(x, wrap_text(text, width - 4, size, bold)) for x, width, text in cells]
+        for index in range(max(len(lines) for _x, lines in wrapped)):
+            self.space(size * 1.4)
+            for x, lines in wrapped:
+                if index < len(lines):
+                    self.page.text(x, self.y, lines[index], size, bold)
+
+    def rule(self, gap=8):
+        self.space(gap)
+        self.page.line(MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y)
+        self.space(gap)
+
+    def to_bytes(self):
+        objects = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            None,
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+            b'<< /Title %s /Producer (Battery Repair ERP) >>' % _pdf_string(self.title),
+        ]
+        page_refs = []
+        for page in self.pages:
+            content = zlib.compress(b'\n'.join(page.ops))
+            objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(content), content))
+            objects.append(
+                b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> '
+                b'/Contents %d 0 R >>' % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+            )
+            page_refs.append(b'%d 0 R' % len(objects))
+        objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(page_refs), len(page_refs))
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        xref = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+        output += b'trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+        return bytes(output)
+
+
+def _money(amount):
+    # The rupee sign is not in WinAnsi, so documents spell the currency out
+    return f'Rs. {amount or 0:.2f}'
+
+
+def _header(document, shop_name, subtitle, number_label, number, date_label, date):
+    center = PAGE_WIDTH / 2
+    document.text((shop_name or 'Battery Repair Service').upper(), size=16, bold=True, x=center, align='center', leading=20)
+    document.text(subtitle, size=11, x=center, align='center')
+    document.rule()
+    document.text(f'{number_label}: {number}', bold=True)
+    document.page.text(PAGE_WIDTH - MARGIN, document.y, f'{date_label}: {date}', 10, True, 'right')
+
+
+def _customer_and_battery(document, data):
+    document.rule()
+    document.text('Customer Details', size=11, bold=True)
+    document.text(f"Name: {data['customer_name']}")
+    document.text(f"Mobile: {data['customer_mobile']}")
+    if data['customer_mobile_secondary']:
+        document.text(f"Secondary: {data['customer_mobile_secondary']}")
+    document.space(6)
+    document.text('Battery Details', size=11, bold=True)
+    document.text(f"Type: {data['battery_type']}")
+    document.text(f"Voltage: {data['voltage']}")
+    document.text(f"Capacity: {data['capacity']}")
+
+
+def _notes(document, title, notes):
+    document.rule()
+    document.text(title, size=11, bold=True)
+    for note in notes:
+        document.text(f'- {note}', size=9)
+
+
+def render_receipt(data):
+    """Battery inward receipt, the PDF counterpart of templates/receipt.html"""
+    document = PdfDocument(f"Receipt {data['battery_id']}")
+    _header(document, data['shop_name'], 'Battery Inward Receipt', 'Receipt No', data['battery_id'],
+            'Date & Time', data['inward_date'])
+    _customer_and_battery(document, data)
+    document.text(f"Status: {data['status']}")
+    if data['is_pickup']:
+        document.space(4)
+        document.text('Pickup Service: Battery collected from customer site')
+        if data['pickup_charge'] > 0:
+            document.text(f"Pickup Charge: {_money(data['pickup_charge'])}")
+    _notes(document, 'Important Notes', [
+        'Please keep this receipt safe for battery collection',
+        f"Battery ID: {data['battery_id']} is required for all inquiries",
+        'Estimated repair time: 2-5 working days',
+        'Final charges will be communicated after diagnosis',
+    ])
+    document.space(12)
+    document.text('Thank you for choosing our service!', size=9, x=PAGE_WIDTH / 2, align='center')
+    return document.to_bytes()
+
+
+def render_bill(data):
+    """Service bill with status history and totals, the PDF counterpart of templates/bill.html"""
+    document = PdfDocument(f"Bill BILL-{data['battery_id']}")
+    _header(document, data['shop_name'], 'Service Bill', 'Bill No', f"BILL-{data['battery_id']}",
+            'Bill Date', data['inward_date'][:10])
+    document.text(f"Battery ID: {data['battery_id']}")
+    _customer_and_battery(document, data)
+
+    document.rule()
+    document.text('Service History', size=11, bold=True)
+    columns = ((MARGIN, 90), (MARGIN + 90, 80), (MARGIN + 170, 215), (MARGIN + 385, 110))
+    document.row([(x, width, label) for (x, width), label in zip(columns, ('Date', 'Status', 'Comments', 'Technician'))], bold=True)
+    for entry in data['history']:
+        document.row([(x, width, value) for (x, width), value in zip(columns, entry)])
+
+    document.rule()
+    document.text('Billing Summary', size=11, bold=True)
+    right = PAGE_WIDTH - MARGIN
+    document.text('Service Charges:')
+    document.page.text(right, document.y, _money(data['service_price']), 10, False, 'right')
+    pickup = data['pickup_charge'] if data['is_pickup'] else 0
+    if data['is_pickup'] and data['pickup_charge'] > 0:
+        document.text('Pickup Service:')
+        document.page.text(right, document.y, _money(pickup), 10, False, 'right')
+    document.text('Total Amount:', bold=True)
+    document.page.text(right, document.y, _money((data['service_price'] or 0) + (pickup or 0)), 10, True, 'right')
+
+    _notes(document, 'Terms & Conditions', [
+        '3 months warranty on repair services',
+        'Battery must be collected within 30 days',
+        'No warranty on battery physical damage',
+        'Payment due upon collection',
+    ])
+    document.space(12)
+    document.text(f"Status: {data['status']}", bold=True, x=PAGE_WIDTH / 2, align='center')
+    document.text('Thank you for your business!', size=9, x=PAGE_WIDTH / 2, align='center')
+    return document.to_bytes()
+
+
+RENDERERS = {'receipt': render_receipt, 'bill': render_bill}
+
+
+def render(kind, data):
+    return RENDERERS[kind](data)
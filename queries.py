@@ -0,0 +1,59 @@
+from app import db
+from models import Customer, Battery, BatteryStatusHistory
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from stats import PENDING_STATUSES
+
+RECENT_HISTORY_LIMIT = 3
+
+
+def batteries_with_customer():
+    """Battery query that loads each row's customer in the same SELECT"""
+    return Battery.query.join(Customer).options(contains_eager(Battery.customer))
+
+
+def pending_batteries():
+    """Pending batteries, oldest first"""
+    return batteries_with_customer().filter(
+        Battery.status.in_(PENDING_STATUSES)
+    ).order_by(Battery.inward_date.asc())
+
+
+def battery_with_details(battery_id):
+    """Load one battery with its customer and full status history (with technicians), or 404"""
+    return Battery.query.options(
+        joinedload(Battery.customer),
+        selectinload(Battery.status_history).joinedload(BatteryStatusHistory.user)
+    ).filter(Battery.id == battery_id).first_or_404()
+
+
+def load_recent_history(batteries, limit=RECENT_HISTORY_LIMIT):
+    """Attach the latest ``limit`` history entries to each battery as ``recent_history``.
+
+    Uses a single ROW_NUMBER() query over all batteries instead of lazily
+    loading every battery's full history. Entries are oldest first, matching
+    ``status_history[-limit:]``.
+    """
+    for battery in batteries:
+        battery.recent_history = []
+    if not batteries:
+        return batteries
+
+    by_id = {battery.id: battery for battery in batteries}
+    row_number = func.row_number().over(
+        partition_by=BatteryStatusHistory.battery_id,
+        order_by=(BatteryStatusHistory.updated_at.desc(), BatteryStatusHistory.id.desc())
+    ).label('row_number')
+    ranked = db.session.query(BatteryStatusHistory.id, row_number).filter(
+        BatteryStatusHistory.battery_id.in_(list(by_id))
+    ).subquery()
+
+    history = BatteryStatusHistory.query.join(
+        ranked, ranked.c.id == BatteryStatusHistory.id
+    ).filter(ranked.c.row_number <= limit).order_by(
+        BatteryStatusHistory.battery_id, BatteryStatusHistory.updated_at, BatteryStatusHistory.id
+    ).all()
+
+    for entry in history:
+        by_id[entry.battery_id].recent_history.append(entry)
+    return batteries
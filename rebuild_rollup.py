@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Rebuild the daily revenue and throughput rollup
+
+Recomputes battery_daily_rollup from the battery table. Use after bulk
+imports or manual SQL edits, or to backfill a range of days. Uses
+DATABASE_URL like the application.
+
+    python rebuild_rollup.py                                  # rebuild every day
+    python rebuild_rollup.py --from 2024-01-01 --to 2024-02-01  # days in [from, to)
+"""
+import argparse
+import logging
+from datetime import date
+
+from app import create_app, db
+from stats import rebuild_daily_rollup
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the daily rollup table')
+    parser.add_argument('--from', dest='start', type=date.fromisoformat, default=None,
+                        help='first inward day to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', type=date.fromisoformat, default=None,
+                        help='day after the last one to rebuild (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        rows = rebuild_daily_rollup(args.start, args.end)
+        db.session.commit()
+        print(f"Rebuilt {rows} rollup rows")
+
+
+if __name__ == '__main__':
+    main()
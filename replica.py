@@ -0,0 +1,103 @@
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+REPLICA_BIND = 'replica'
+# After a user writes, their reads stay on the primary this long so they see their own changes
+REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', '10'))
+LAST_WRITE_KEY = '_db_last_write'
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica bind when the current context asked for it.
+
+    Flushes, INSERT/UPDATE/DELETE statements and raw SQL always use the
+    primary. Without a configured replica every query uses the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _replica_requested() \
+                and not isinstance(clause, (UpdateBase, TextClause)):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _replica_requested():
+    return has_app_context() and g.get('_use_replica', False)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _remember_write(db_session, flush_context):
+    if has_app_context():
+        g._db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _remember_dml(orm_execute_state):
+    # Core insert()/update()/delete() run through session.execute never flush
+    if has_app_context() and (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        g._db_wrote = True
+
+
+def _recently_wrote():
+    return has_request_context() and session.get(LAST_WRITE_KEY, 0) > time.time() - REPLICA_STICKY_SECONDS
+
+
+def read_only(view):
+    """Serve this view's reads from the replica, including streamed response bodies.
+
+    Falls back to the primary for a user who wrote within
+    REPLICA_STICKY_SECONDS, so they never see a replica that lags behind
+    their own change.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _recently_wrote():
+            g._use_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def replica_reads():
+    """Route reads to the replica inside the block (background jobs, scripts)"""
+    previous = g.get('_use_replica', False)
+    g._use_replica = True
+    try:
+        yield
+    finally:
+        g._use_replica = previous
+
+
+@contextmanager
+def primary_reads():
+    """Force reads inside the block onto the primary, e.g. to refresh process-wide caches"""
+    previous = g.get('_use_replica', False)
+    g._use_replica = False
+    try:
+        yield
+    finally:
+        g._use_replica = previous
+
+
+def replica_binds(database_url, options):
+    """SQLALCHEMY_BINDS entry for the replica, or {} when none is configured"""
+    if not database_url:
+        return {}
+    return {REPLICA_BIND: {'url': database_url, **options}}
+
+
+def init_replica(app):
+    @app.after_request
+    def remember_last_write(response):
+        if g.get('_db_wrote'):
+            session[LAST_WRITE_KEY] = time.time()
+        return response
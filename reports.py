@@ -0,0 +1,71 @@
+from stats import rollup_rows
+from datetime import datetime
+
+
+def month_bounds(year, month):
+    """Return the [start, end) datetime range covering one calendar month"""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def year_bounds(year):
+    """Return the [start, end) datetime range covering one calendar year"""
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
+def period_bounds(year, month=None):
+    """[start, end) for a whole year, or one month of it when ``month`` is given"""
+    if month is not None and not 1 <= month <= 12:
+        raise ValueError('month must be between 1 and 12')
+    if not 1 <= year <= 9998:
+        raise ValueError('year out of range')
+    return month_bounds(year, month) if month is not None else year_bounds(year)
+
+
+def aggregate_period(start, end, bucket=None):
+    """Aggregate batteries received in [start, end) from the daily rollup.
+
+    ``bucket`` may be None, 'month' or 'day'. Returns a dict with the period
+    totals and a mapping of bucket number to its completed count and revenue.
+    Revenue counts service and pickup charges of completed batteries, as
+    the dashboard does.
+    """
+    totals = {'total_count': 0, 'completed_count': 0, 'revenue': 0.0}
+    buckets = {}
+    for day, status, count, service_revenue, pickup_revenue in rollup_rows(start.date(), end.date()):
+        totals['total_count'] += count
+        if status != 'Ready':
+            continue
+        revenue = float(service_revenue) + float(pickup_revenue)
+        totals['completed_count'] += count
+        totals['revenue'] += revenue
+        if bucket is not None:
+            key = day.month if bucket == 'month' else day.day
+            entry = buckets.setdefault(key, {'count': 0, 'revenue': 0.0})
+            entry['count'] += count
+            entry['revenue'] += revenue
+
+    totals['buckets'] = buckets
+    return totals
+
+
+def monthly_summary(year, month):
+    """Totals for one calendar month"""
+    start, end = month_bounds(year, month)
+    return aggregate_period(start, end)
+
+
+def yearly_summary(year):
+    """Totals for one calendar year plus a twelve-entry monthly breakdown"""
+    start, end = year_bounds(year)
+    summary = aggregate_period(start, end, bucket='month')
+    summary['monthly_breakdown'] = [
+        {
+            'month': datetime(year, month, 1).strftime('%B'),
+            'revenue': summary['buckets'].get(month, {}).get('revenue', 0.0),
+            'count': summary['buckets'].get(month, {}).get('count', 0)
+        }
+        for month in range(1, 13)
+    ]
+    return summary
@@ -1,13 +1,27 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response, jsonify, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file, Response, stream_with_context, current_app
 from flask_login import login_required, current_user
 from app import db
-from models import User, Customer, Battery, BatteryStatusHistory, SystemSettings
+from models import User, Customer, Battery, BatteryStatusHistory, SystemSettings, BatteryIdCounter
+from stats import PENDING_STATUSES, get_dashboard_stats, get_status_totals, record_battery_created
+from reports import month_bounds, year_bounds, period_bounds, monthly_summary, yearly_summary
+from analytics import turnaround_for_period
+from replica import read_only
+from page_cache import cached_page, battery_validator, report_validator
+from documents import render_document, document_filename, bills_query, stream_documents_zip
+from pagination import paginate_batteries
+from queries import batteries_with_customer, pending_batteries, battery_with_details, load_recent_history
+from search import search_batteries
+from exports import stream_battery_csv
+from backup import stream_backup, gzip_stream, open_backup, restore_backup, BackupError, BACKUP_EXTENSIONS
+from jobs import enqueue_job, job_status, results_dir, fail_stale_jobs, ACTIVE_JOB_STATUSES
+from models import BackgroundJob
+from user_cache import user_cache
+from events import record_event, event_stream, LIVE_UPDATES_ENABLED
+from workflow import check_transition, apply_status_changes, TransitionError
+from intake import bulk_intake, parse_intake_csv, IntakeError, INTAKE_FIELDS, MAX_INTAKE_ROWS
 from werkzeug.security import generate_password_hash
-from datetime import datetime
-import csv
-import io
-import json
-import tempfile
+from datetime import datetime, timedelta
+import logging
 import os
 
 main_bp = Blueprint('main', __name__)
@@ -19,31 +33,15 @@ def index():
 @main_bp.route('/dashboard')
 @login_required
 def dashboard():
-    from sqlalchemy import func
-    
-    # Get statistics for dashboard
-    total_batteries = Battery.query.count()
-    pending_batteries = Battery.query.filter(Battery.status.in_(['Received', 'Diagnosing', 'Repairing'])).count()
-    completed_batteries = Battery.query.filter_by(status='Ready').count()
-    
-    # Calculate revenue statistics including pickup charges
-    service_revenue = db.session.query(func.sum(Battery.service_price)).filter_by(status='Ready').scalar() or 0
-    pickup_revenue = db.session.query(func.sum(Battery.pickup_charge)).filter(
-        Battery.status == 'Ready', Battery.is_pickup == True
-    ).scalar() or 0
-    total_revenue = service_revenue + pickup_revenue
-    avg_service_price = db.session.query(func.avg(Battery.service_price)).filter_by(status='Ready').scalar() or 0
+    # Dashboard counters and revenue are summed from the per-day status rollup
+    stats = get_dashboard_stats()
     
     # Recent batteries
-    recent_batteries = Battery.query.order_by(Battery.inward_date.desc()).limit(5).all()
+    recent_batteries = batteries_with_customer().order_by(Battery.inward_date.desc()).limit(5).all()
     
     return render_template('dashboard.html', 
-                         total_batteries=total_batteries,
-                         pending_batteries=pending_batteries,
-                         completed_batteries=completed_batteries,
                          recent_batteries=recent_batteries,
-                         total_revenue=float(total_revenue),
-                         avg_service_price=float(avg_service_price))
+                         **stats)
 
 @main_bp.route('/battery/entry', methods=['GET', 'POST'])
 @login_required
@@ -100,6 +98,8 @@ def battery_entry():
             status_history.comments = f'Battery received from customer{" - Pickup service" if is_pickup else ""}'
             status_history.updated_by = current_user.id
             db.session.add(status_history)
+            record_battery_created(battery)
+            record_event('battery_created', battery)
             
             db.session.commit()
             flash(f'Battery {battery_id} has been successfully registered.', 'success')
@@ -111,6 +111,38 @@ def battery_entry():
     
     return render_template('battery_entry.html')
 
+@main_bp.route('/battery/bulk', methods=['GET', 'POST'])
+@login_required
+def battery_bulk_entry():
+    """Register a fleet or dealer drop-off from one CSV upload"""
+    if current_user.role not in ['shop_staff', 'admin']:
+        flash('Access denied. This feature is only available to shop staff and admin.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    result = None
+    if request.method == 'POST':
+        upload = request.files.get('intake_file')
+        if not upload or not upload.filename.lower().endswith('.csv'):
+            flash('Please upload a CSV file.', 'error')
+            return render_template('battery_bulk_entry.html', fields=INTAKE_FIELDS, max_rows=MAX_INTAKE_ROWS)
+        
+        try:
+            rows = parse_intake_csv(upload.stream)
+            result = bulk_intake(rows, current_user.id)
+            db.session.commit()
+            if result['created']:
+                flash(f'{len(result["created"])} batteries registered.', 'success')
+            if result['errors']:
+                flash(f'{len(result["errors"])} rows were skipped. See the report below.', 'warning')
+        except IntakeError as e:
+            db.session.rollback()
+            flash(str(e), 'error')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error registering batteries: {str(e)}', 'error')
+    
+    return render_template('battery_bulk_entry.html', result=result, fields=INTAKE_FIELDS, max_rows=MAX_INTAKE_ROWS)
+
 @main_bp.route('/technician/panel', methods=['GET', 'POST'])
 @login_required
 def technician_panel():
@@ -118,59 +150,28 @@ def technician_panel():
         flash('Access denied.', 'error')
         return redirect(url_for('main.dashboard'))
     
-    batteries = []
     search_query = ''
+    show_full_details = False
     
-    # Check if there's a search parameter from GET request (e.g., from dashboard links)
-    if request.method == 'GET' and request.args.get('search'):
-        search_query = request.args.get('search', '').strip()
-        if search_query:
-            batteries = Battery.query.join(Customer).filter(
-                db.and_(
-                    Battery.status.in_(['Received', 'Diagnosing', 'Repairing']),
-                    db.or_(
-                        Battery.battery_id.ilike(f'%{search_query}%'),
-                        Customer.mobile.ilike(f'%{search_query}%'),
-                        Customer.name.ilike(f'%{search_query}%')
-                    )
-                )
-            ).order_by(Battery.inward_date.asc()).all()
-            show_full_details = True
-        else:
-            batteries = Battery.query.filter(
-                Battery.status.in_(['Received', 'Diagnosing', 'Repairing'])
-            ).order_by(Battery.inward_date.asc()).all()
-            show_full_details = False
-    elif request.method == 'POST':
+    if request.method == 'POST':
+        # Search by battery ID, customer mobile, or customer name;
+        # an empty search shows all pending batteries in full
         search_query = request.form.get('search_query', '').strip()
-        
-        if search_query:
-            # Search by battery ID, customer mobile, or customer name
-            batteries = Battery.query.join(Customer).filter(
-                db.and_(
-                    Battery.status.in_(['Received', 'Diagnosing', 'Repairing']),
-                    db.or_(
-                        Battery.battery_id.ilike(f'%{search_query}%'),
-                        Customer.mobile.ilike(f'%{search_query}%'),
-                        Customer.name.ilike(f'%{search_query}%')
-                    )
-                )
-            ).order_by(Battery.inward_date.asc()).all()
-            show_full_details = True
-        else:
-            # If no search query, show all pending batteries
-            batteries = Battery.query.filter(
-                Battery.status.in_(['Received', 'Diagnosing', 'Repairing'])
-            ).order_by(Battery.inward_date.asc()).all()
-            show_full_details = True
+        show_full_details = True
+    elif request.args.get('search'):
+        # Search parameter from GET request (e.g., from dashboard links)
+        search_query = request.args.get('search', '').strip()
+        show_full_details = bool(search_query)
+    
+    if search_query:
+        batteries = search_batteries(search_query, statuses=PENDING_STATUSES, newest_first=False).all()
     else:
-        # GET request - show only battery IDs (minimal view)
-        batteries = Battery.query.filter(
-            Battery.status.in_(['Received', 'Diagnosing', 'Repairing'])
-        ).order_by(Battery.inward_date.asc()).all()
-        show_full_details = False
+        batteries = pending_batteries().all()
+    if show_full_details:
+        load_recent_history(batteries)
     
-    return render_template('technician_panel.html', batteries=batteries, search_query=search_query, show_full_details=show_full_details)
+    return render_template('technician_panel.html', batteries=batteries, search_query=search_query,
+                           show_full_details=show_full_details, live_updates=LIVE_UPDATES_ENABLED)
 
 @main_bp.route('/battery/update', methods=['POST'])
 @login_required
@@ -186,27 +187,37 @@ def update_battery_status():
     
     try:
         battery = Battery.query.get_or_404(battery_id)
-        battery.status = new_status
-        
-        if service_price:
-            battery.service_price = float(service_price)
-        
-        # Add status history
-        status_history = BatteryStatusHistory()
-        status_history.battery_id = battery.id
-        status_history.status = new_status
-        status_history.comments = comments
-        status_history.updated_by = current_user.id
-        db.session.add(status_history)
+        check_transition(battery.status, new_status)
+        apply_status_changes(
+            [(battery, new_status, comments, service_price if service_price else None)],
+            current_user.id
+        )
         db.session.commit()
         
         flash(f'Battery {battery.battery_id} status updated to {new_status}.', 'success')
+    except TransitionError as e:
+        db.session.rollback()
+        flash(str(e), 'error')
     except Exception as e:
         db.session.rollback()
         flash(f'Error updating battery status: {str(e)}', 'error')
     
     return redirect(url_for('main.technician_panel'))
 
+@main_bp.route('/events/stream')
+@login_required
+def events_stream():
+    """Server-Sent Events feed of battery intakes and status changes"""
+    if not LIVE_UPDATES_ENABLED:
+        # 204 tells EventSource to stop reconnecting
+        return Response(status=204)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    app = current_app._get_current_object()
+    response = Response(event_stream(app, last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @main_bp.route('/search', methods=['GET', 'POST'])
 @login_required
 def search():
@@ -217,22 +228,16 @@ def search():
         search_query = request.form.get('search_query', '').strip()
         
         if search_query:
-            # Search by battery ID or customer mobile
-            batteries = Battery.query.join(Customer).filter(
-                db.or_(
-                    Battery.battery_id.ilike(f'%{search_query}%'),
-                    Customer.mobile.ilike(f'%{search_query}%'),
-                    Customer.name.ilike(f'%{search_query}%')
-                )
-            ).all()
-            results = batteries
+            # Ranked search by battery ID, customer mobile or name
+            results = search_batteries(search_query).all()
     
     return render_template('search.html', results=results, search_query=search_query)
 
 @main_bp.route('/receipt/<int:battery_id>')
 @login_required
+@cached_page(battery_validator)
 def receipt(battery_id):
-    battery = Battery.query.get_or_404(battery_id)
+    battery = battery_with_details(battery_id)
     
     def get_shop_name():
         return SystemSettings.get_setting('shop_name', 'Battery Repair Service')
@@ -241,8 +246,9 @@ def receipt(battery_id):
 
 @main_bp.route('/bill/<int:battery_id>')
 @login_required
+@cached_page(battery_validator)
 def bill(battery_id):
-    battery = Battery.query.get_or_404(battery_id)
+    battery = battery_with_details(battery_id)
     if battery.status != 'Ready':
         flash('Bill can only be generated for completed repairs.', 'error')
         return redirect(url_for('main.search'))
@@ -252,54 +258,80 @@ def bill(battery_id):
     
     return render_template('bill.html', battery=battery, get_shop_name=get_shop_name)
 
+def _pdf_response(kind, battery):
+    response = Response(render_document(kind, battery), mimetype='application/pdf')
+    response.headers['Content-Disposition'] = f'inline; filename={document_filename(kind, battery)}'
+    return response
+
+@main_bp.route('/receipt/<int:battery_id>/pdf')
+@login_required
+@cached_page(battery_validator)
+def receipt_pdf(battery_id):
+    return _pdf_response('receipt', battery_with_details(battery_id))
+
+@main_bp.route('/bill/<int:battery_id>/pdf')
+@login_required
+@cached_page(battery_validator)
+def bill_pdf(battery_id):
+    battery = battery_with_details(battery_id)
+    if battery.status != 'Ready':
+        flash('Bill can only be generated for completed repairs.', 'error')
+        return redirect(url_for('main.search'))
+    return _pdf_response('bill', battery)
+
+@main_bp.route('/reports/bills.zip')
+@login_required
+@read_only
+def bills_zip():
+    """Every bill for a month (or a whole year) as one streamed ZIP of PDFs"""
+    if current_user.role not in ['admin', 'shop_staff']:
+        flash('Access denied. Admin or staff access required.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    now = datetime.now()
+    year = request.args.get('year', now.year, type=int)
+    month = request.args.get('month', type=int)
+    if 'year' not in request.args and 'month' not in request.args:
+        month = now.month
+    
+    try:
+        start, end = period_bounds(year, month)
+    except ValueError:
+        flash('Invalid report period.', 'error')
+        return redirect(url_for('main.monthly_report'))
+    
+    response = Response(stream_with_context(stream_documents_zip(bills_query(start, end))), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename=bills_{start.strftime("%Y_%m") if month else year}.zip'
+    return response
+
 @main_bp.route('/export/csv')
 @login_required
+@read_only
 def export_csv():
+    # Optional filters: ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD&status=Ready
     try:
-        batteries = Battery.query.join(Customer).all()
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'Battery ID', 'Customer Name', 'Mobile', 'Battery Type', 
-            'Voltage', 'Capacity', 'Status', 'Inward Date', 
-            'Service Price', 'Last Updated'
-        ])
-        
-        # Write data
-        for battery in batteries:
-            last_update = battery.status_history[-1].updated_at if battery.status_history else battery.inward_date
-            writer.writerow([
-                battery.battery_id,
-                battery.customer.name,
-                battery.customer.mobile,
-                battery.battery_type,
-                battery.voltage,
-                battery.capacity,
-                battery.status,
-                battery.inward_date.strftime('%Y-%m-%d %H:%M'),
-                battery.service_price,
-                last_update.strftime('%Y-%m-%d %H:%M')
-            ])
-        
-        output.seek(0)
-        
-        response = make_response(output.getvalue())
-        response.headers['Content-Disposition'] = f'attachment; filename=battery_records_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        response.headers['Content-type'] = 'text/csv'
-        
-        return response
-        
-    except Exception as e:
-        flash(f'Error exporting data: {str(e)}', 'error')
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d') if date_from else None
+        # date_to is inclusive of the whole day
+        date_to = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1) if date_to else None
+    except ValueError:
+        flash('Invalid date filter. Use YYYY-MM-DD.', 'error')
         return redirect(url_for('main.dashboard'))
+    status = request.args.get('status') or None
+    
+    response = Response(
+        stream_with_context(stream_battery_csv(date_from, date_to, status)),
+        mimetype='text/csv'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=battery_records_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    return response
 
 @main_bp.route('/battery/<int:battery_id>/details')
 @login_required
+@cached_page(battery_validator)
 def battery_details(battery_id):
-    battery = Battery.query.get_or_404(battery_id)
+    battery = battery_with_details(battery_id)
     return render_template('battery_details.html', battery=battery)
 
 # Admin routes
@@ -343,6 +375,7 @@ def admin_add_user():
                 user.password_hash = generate_password_hash(password)
             db.session.add(user)
             db.session.commit()
+            user_cache.invalidate(user.id)
             flash(f'User {username} created successfully.', 'success')
             return redirect(url_for('main.admin_users'))
         except Exception as e:
@@ -366,6 +399,7 @@ def admin_toggle_user(user_id):
     user.active = not user.active
     try:
         db.session.commit()
+        user_cache.invalidate(user.id)
         status = 'activated' if user.active else 'deactivated'
         flash(f'User {user.username} has been {status}.', 'success')
     except Exception as e:
@@ -388,10 +422,12 @@ def admin_settings():
         battery_padding = request.form.get('battery_id_padding')
         
         try:
+            old_prefix = SystemSettings.get_setting('battery_id_prefix', 'BAT')
             SystemSettings.set_setting('shop_name', shop_name)
             SystemSettings.set_setting('battery_id_prefix', battery_prefix)
             SystemSettings.set_setting('battery_id_start', battery_start)
             SystemSettings.set_setting('battery_id_padding', battery_padding)
+            BatteryIdCounter.sync_with_settings(old_prefix, battery_prefix, int(battery_start or 1))
             db.session.commit()
             flash('Settings updated successfully.', 'success')
         except Exception as e:
@@ -409,86 +445,27 @@ def admin_settings():
 
 @main_bp.route('/admin/backup')
 @login_required
+@read_only
 def admin_backup():
     if current_user.role not in ['admin', 'shop_staff']:
         flash('Access denied. Admin or staff access required.', 'error')
         return redirect(url_for('main.dashboard'))
     
-    try:
-        # Create comprehensive backup data
-        backup_data = {
-            'timestamp': datetime.now().isoformat(),
-            'users': [],
-            'customers': [],
-            'batteries': [],
-            'status_history': [],
-            'settings': []
-        }
-        
-        # Export users (without passwords for security)
-        for user in User.query.all():
-            backup_data['users'].append({
-                'username': user.username,
-                'full_name': user.full_name,
-                'role': user.role,
-                'created_at': user.created_at.isoformat() if user.created_at else None,
-                'is_active': user.is_active
-            })
-        
-        # Export customers
-        for customer in Customer.query.all():
-            backup_data['customers'].append({
-                'id': customer.id,
-                'name': customer.name,
-                'mobile': customer.mobile,
-                'created_at': customer.created_at.isoformat() if customer.created_at else None
-            })
-        
-        # Export batteries
-        for battery in Battery.query.all():
-            backup_data['batteries'].append({
-                'id': battery.id,
-                'battery_id': battery.battery_id,
-                'customer_id': battery.customer_id,
-                'battery_type': battery.battery_type,
-                'voltage': battery.voltage,
-                'capacity': battery.capacity,
-                'status': battery.status,
-                'inward_date': battery.inward_date.isoformat() if battery.inward_date else None,
-                'service_price': battery.service_price
-            })
-        
-        # Export status history
-        for history in BatteryStatusHistory.query.all():
-            backup_data['status_history'].append({
-                'id': history.id,
-                'battery_id': history.battery_id,
-                'status': history.status,
-                'comments': history.comments,
-                'updated_by': history.updated_by,
-                'updated_at': history.updated_at.isoformat() if history.updated_at else None
-            })
-        
-        # Export settings
-        for setting in SystemSettings.query.all():
-            backup_data['settings'].append({
-                'setting_key': setting.setting_key,
-                'setting_value': setting.setting_value,
-                'updated_at': setting.updated_at.isoformat() if setting.updated_at else None
-            })
-        
-        # Create JSON response
-        backup_json = json.dumps(backup_data, indent=2)
-        
-        response = make_response(backup_json)
-        response.headers['Content-Disposition'] = f'attachment; filename=battery_erp_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        response.headers['Content-Type'] = 'application/json'
-        
-        return response
-        
-    except Exception as e:
-        flash(f'Error creating backup: {str(e)}', 'error')
-        return redirect(url_for('main.dashboard'))
+    # ?compress=gzip produces a .jsonl.gz download
+    compress = request.args.get('compress') == 'gzip'
+    filename = f'battery_erp_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.jsonl'
+    
+    chunks = stream_backup()
+    if compress:
+        chunks = gzip_stream(chunks)
+        filename += '.gz'
+    
+    response = Response(
+        stream_with_context(chunks),
+        mimetype='application/gzip' if compress else 'application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
 
 @main_bp.route('/admin/restore', methods=['GET', 'POST'])
 @login_required
@@ -507,111 +484,32 @@ def admin_restore():
             flash('No file selected.', 'error')
             return render_template('admin/restore.html')
         
-        if file and file.filename and file.filename.endswith('.json'):
+        if file and file.filename and file.filename.endswith(BACKUP_EXTENSIONS):
+            confirm = request.form.get('confirm_restore')
+            if confirm != 'CONFIRM':
+                flash('Please type "CONFIRM" to proceed with restore.', 'error')
+                return render_template('admin/restore.html')
+            
+            def log_progress(table, count):
+                logging.info(f"Restore progress: {count} {table} rows")
+            
             try:
-                backup_data = json.loads(file.read().decode('utf-8'))
-                
-                # Clear existing data (be careful!)
-                confirm = request.form.get('confirm_restore')
-                if confirm != 'CONFIRM':
-                    flash('Please type "CONFIRM" to proceed with restore.', 'error')
-                    return render_template('admin/restore.html')
-                
-                # Implement actual restore functionality
-                try:
-                    # Backup current admin user before clearing data
-                    admin_user_backup = {
-                        'username': current_user.username,
-                        'password_hash': current_user.password_hash,
-                        'role': current_user.role,
-                        'full_name': current_user.full_name
-                    }
-                    
-                    # Clear existing data (preserve current admin)
-                    BatteryStatusHistory.query.delete()
-                    Battery.query.delete()
-                    Customer.query.delete()
-                    SystemSettings.query.delete()
-                    # Don't delete current admin user
-                    User.query.filter(User.id != current_user.id).delete()
-                    
-                    db.session.commit()
-                    
-                    # Restore customers
-                    customer_id_mapping = {}
-                    for customer_data in backup_data.get('customers', []):
-                        customer = Customer()
-                        customer.name = customer_data['name']
-                        customer.mobile = customer_data['mobile']
-                        if customer_data.get('created_at'):
-                            customer.created_at = datetime.fromisoformat(customer_data['created_at'])
-                        db.session.add(customer)
-                        db.session.flush()
-                        customer_id_mapping[customer_data['id']] = customer.id
-                    
-                    # Restore batteries
-                    battery_id_mapping = {}
-                    for battery_data in backup_data.get('batteries', []):
-                        battery = Battery()
-                        battery.battery_id = battery_data['battery_id']
-                        battery.customer_id = customer_id_mapping.get(battery_data['customer_id'])
-                        battery.battery_type = battery_data['battery_type']
-                        battery.voltage = battery_data['voltage']
-                        battery.capacity = battery_data['capacity']
-                        battery.status = battery_data['status']
-                        battery.service_price = battery_data.get('service_price', 0.0)
-                        if battery_data.get('inward_date'):
-                            battery.inward_date = datetime.fromisoformat(battery_data['inward_date'])
-                        db.session.add(battery)
-                        db.session.flush()
-                        battery_id_mapping[battery_data['id']] = battery.id
-                    
-                    # Restore users (except passwords)
-                    for user_data in backup_data.get('users', []):
-                        if user_data['username'] != current_user.username:  # Don't overwrite current admin
-                            user = User()
-                            user.username = user_data['username']
-                            user.full_name = user_data['full_name']
-                            user.role = user_data['role']
-                            user.password_hash = generate_password_hash('password123')
-                            user.active = user_data.get('is_active', True)
-                            if user_data.get('created_at'):
-                                user.created_at = datetime.fromisoformat(user_data['created_at'])
-                            db.session.add(user)
-                    
-                    # Restore status history
-                    for history_data in backup_data.get('status_history', []):
-                        if battery_id_mapping.get(history_data['battery_id']):
-                            history = BatteryStatusHistory()
-                            history.battery_id = battery_id_mapping[history_data['battery_id']]
-                            history.status = history_data['status']
-                            history.comments = history_data.get('comments', '')
-                            history.updated_by = current_user.id  # Assign to current admin
-                            if history_data.get('updated_at'):
-                                history.updated_at = datetime.fromisoformat(history_data['updated_at'])
-                            db.session.add(history)
-                    
-                    # Restore system settings
-                    for setting_data in backup_data.get('settings', []):
-                        setting = SystemSettings()
-                        setting.setting_key = setting_data['setting_key']
-                        setting.setting_value = setting_data['setting_value']
-                        if setting_data.get('updated_at'):
-                            setting.updated_at = datetime.fromisoformat(setting_data['updated_at'])
-                        db.session.add(setting)
-                    
-                    db.session.commit()
-                    flash('Data restored successfully! Note: Restored user passwords have been reset to "password123".', 'success')
-                    return redirect(url_for('main.dashboard'))
-                    
-                except Exception as restore_error:
-                    db.session.rollback()
-                    flash(f'Error during restore: {str(restore_error)}', 'error')
-                
-            except Exception as e:
+                # Parse the upload incrementally and insert in batches
+                records = open_backup(file.stream, file.filename)
+                admin = db.session.get(User, current_user.id)
+                restore_backup(records, admin.id, admin.username, progress=log_progress)
+                db.session.commit()
+                user_cache.invalidate()
+                flash('Data restored successfully! Note: Restored user passwords have been reset to "password123".', 'success')
+                return redirect(url_for('main.dashboard'))
+            except BackupError as e:
+                db.session.rollback()
                 flash(f'Error reading backup file: {str(e)}', 'error')
+            except Exception as restore_error:
+                db.session.rollback()
+                flash(f'Error during restore: {str(restore_error)}', 'error')
         else:
-            flash('Please upload a valid JSON backup file.', 'error')
+            flash('Please upload a valid backup file (.json, .jsonl or .jsonl.gz).', 'error')
     
     return render_template('admin/restore.html')
 
@@ -626,88 +524,182 @@ def staff_backup():
 
 @main_bp.route('/finished_batteries')
 @login_required
+@read_only
 def finished_batteries():
-    finished = Battery.query.filter_by(status='Ready').order_by(Battery.inward_date.desc()).all()
-    return render_template('finished_batteries.html', batteries=finished)
+    page = paginate_batteries(
+        batteries_with_customer().filter(Battery.status == 'Ready'),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        descending=True
+    )
+    totals = get_status_totals('Ready')
+    return render_template('finished_batteries.html', batteries=page.items, page=page, totals=totals)
 
 @main_bp.route('/reports/monthly')
 @login_required
+@read_only
+@cached_page(report_validator)
 def monthly_report():
-    from sqlalchemy import func, extract
-    
     # Get current month data
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    
-    monthly_batteries = Battery.query.filter(
-        extract('month', Battery.inward_date) == current_month,
-        extract('year', Battery.inward_date) == current_year
-    ).all()
+    now = datetime.now()
+    start, end = month_bounds(now.year, now.month)
     
-    monthly_completed = Battery.query.filter(
-        Battery.status == 'Ready',
-        extract('month', Battery.inward_date) == current_month,
-        extract('year', Battery.inward_date) == current_year
-    ).count()
+    page = paginate_batteries(
+        batteries_with_customer().filter(Battery.inward_date >= start, Battery.inward_date < end),
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
     
-    monthly_revenue = db.session.query(func.sum(Battery.service_price)).filter(
-        Battery.status == 'Ready',
-        extract('month', Battery.inward_date) == current_month,
-        extract('year', Battery.inward_date) == current_year
-    ).scalar() or 0
+    summary = monthly_summary(now.year, now.month)
     
     return render_template('reports/monthly.html', 
-                         batteries=monthly_batteries,
-                         completed_count=monthly_completed,
-                         total_revenue=float(monthly_revenue),
-                         month_name=datetime.now().strftime('%B %Y'))
+                         batteries=page.items,
+                         page=page,
+                         total_count=summary['total_count'],
+                         completed_count=summary['completed_count'],
+                         total_revenue=summary['revenue'],
+                         month_name=now.strftime('%B %Y'))
 
 @main_bp.route('/reports/yearly')
 @login_required
+@read_only
+@cached_page(report_validator)
 def yearly_report():
-    from sqlalchemy import func, extract
-    
     # Get current year data
     current_year = datetime.now().year
+    start, end = year_bounds(current_year)
     
-    yearly_batteries = Battery.query.filter(
-        extract('year', Battery.inward_date) == current_year
-    ).all()
-    
-    yearly_completed = Battery.query.filter(
-        Battery.status == 'Ready',
-        extract('year', Battery.inward_date) == current_year
-    ).count()
-    
-    yearly_revenue = db.session.query(func.sum(Battery.service_price)).filter(
-        Battery.status == 'Ready',
-        extract('year', Battery.inward_date) == current_year
-    ).scalar() or 0
-    
-    # Get monthly breakdown
-    monthly_breakdown = []
-    for month in range(1, 13):
-        month_revenue = db.session.query(func.sum(Battery.service_price)).filter(
-            Battery.status == 'Ready',
-            extract('month', Battery.inward_date) == month,
-            extract('year', Battery.inward_date) == current_year
-        ).scalar() or 0
-        
-        month_count = Battery.query.filter(
-            Battery.status == 'Ready',
-            extract('month', Battery.inward_date) == month,
-            extract('year', Battery.inward_date) == current_year
-        ).count()
-        
-        monthly_breakdown.append({
-            'month': datetime(current_year, month, 1).strftime('%B'),
-            'revenue': float(month_revenue),
-            'count': month_count
-        })
+    page = paginate_batteries(
+        batteries_with_customer().filter(Battery.inward_date >= start, Battery.inward_date < end),
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+    
+    # Year totals and the monthly breakdown are summed from the daily rollup rows
+    summary = yearly_summary(current_year)
     
     return render_template('reports/yearly.html', 
-                         batteries=yearly_batteries,
-                         completed_count=yearly_completed,
-                         total_revenue=float(yearly_revenue),
+                         batteries=page.items,
+                         page=page,
+                         total_count=summary['total_count'],
+                         completed_count=summary['completed_count'],
+                         total_revenue=summary['revenue'],
                          year=current_year,
-                         monthly_breakdown=monthly_breakdown)
+                         monthly_breakdown=summary['monthly_breakdown'])
+
+
+@main_bp.route('/reports/turnaround')
+@login_required
+@read_only
+@cached_page(report_validator)
+def turnaround_report():
+    """Turnaround and time-in-status percentiles for one month or year"""
+    now = datetime.now()
+    year = request.args.get('year', now.year, type=int)
+    month = request.args.get('month', type=int)
+    if 'year' not in request.args and 'month' not in request.args:
+        month = now.month
+    
+    try:
+        start, end = period_bounds(year, month)
+    except ValueError:
+        flash('Invalid report period.', 'error')
+        return redirect(url_for('main.turnaround_report'))
+    
+    analytics = turnaround_for_period(start, end)
+    period_name = start.strftime('%B %Y') if month else str(year)
+    
+    return render_template('reports/turnaround.html',
+                         analytics=analytics,
+                         period_name=period_name,
+                         year=year,
+                         month=month)
+
+# Background jobs: enqueue heavy work, poll its status, download the result
+JOB_ROLES = {
+    'backup': ['admin', 'shop_staff'],
+    'restore': ['admin'],
+    'export_csv': ['admin', 'shop_staff', 'technician'],
+    'yearly_report': ['admin', 'shop_staff', 'technician'],
+    'bills_zip': ['admin', 'shop_staff'],
+}
+
+@main_bp.route('/jobs/<kind>', methods=['POST'])
+@login_required
+def enqueue_background_job(kind):
+    if kind not in JOB_ROLES:
+        return jsonify({'error': f'Unknown job kind: {kind}'}), 404
+    if current_user.role not in JOB_ROLES[kind]:
+        return jsonify({'error': 'Access denied.'}), 403
+    
+    params = {}
+    if kind == 'backup':
+        params['compress'] = request.values.get('compress')
+    elif kind == 'export_csv':
+        try:
+            for key in ('date_from', 'date_to'):
+                if request.values.get(key):
+                    params[key] = datetime.strptime(request.values[key], '%Y-%m-%d').isoformat()
+        except ValueError:
+            return jsonify({'error': 'Invalid date filter. Use YYYY-MM-DD.'}), 400
+        if params.get('date_to'):
+            # date_to is inclusive of the whole day
+            params['date_to'] = (datetime.fromisoformat(params['date_to']) + timedelta(days=1)).isoformat()
+        params['status'] = request.values.get('status') or None
+    elif kind == 'yearly_report':
+        params['year'] = request.values.get('year', type=int) or datetime.now().year
+    elif kind == 'bills_zip':
+        params['year'] = request.values.get('year', type=int) or datetime.now().year
+        params['month'] = request.values.get('month', type=int)
+        try:
+            period_bounds(params['year'], params['month'])
+        except ValueError:
+            return jsonify({'error': 'Invalid report period.'}), 400
+    elif kind == 'restore':
+        file = request.files.get('backup_file')
+        if not file or not file.filename or not file.filename.endswith(BACKUP_EXTENSIONS):
+            return jsonify({'error': 'Please upload a valid backup file (.json, .jsonl or .jsonl.gz).'}), 400
+        if request.form.get('confirm_restore') != 'CONFIRM':
+            return jsonify({'error': 'Please type "CONFIRM" to proceed with restore.'}), 400
+        input_path = os.path.join(results_dir(), f'upload_{datetime.now().strftime("%Y%m%d_%H%M%S_%f")}')
+        file.save(input_path)
+        params.update({
+            'input_path': input_path,
+            'filename': file.filename,
+            'admin_id': current_user.id,
+            'admin_username': db.session.get(User, current_user.id).username
+        })
+    
+    job = enqueue_job(kind, params, current_user.id)
+    return jsonify({
+        'job_id': job.id,
+        'status_url': url_for('main.background_job_status', job_id=job.id),
+        'result_url': url_for('main.background_job_result', job_id=job.id)
+    }), 202
+
+def _get_own_job(job_id):
+    job = BackgroundJob.query.get_or_404(job_id)
+    if job.created_by != current_user.id and current_user.role != 'admin':
+        return None
+    return job
+
+@main_bp.route('/jobs/<job_id>')
+@login_required
+def background_job_status(job_id):
+    job = _get_own_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Access denied.'}), 403
+    if job.status in ACTIVE_JOB_STATUSES and fail_stale_jobs():
+        db.session.commit()
+    return jsonify(job_status(job))
+
+@main_bp.route('/jobs/<job_id>/result')
+@login_required
+def background_job_result(job_id):
+    job = _get_own_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Access denied.'}), 403
+    if job.status != 'finished' or not job.result_path or not os.path.exists(job.result_path):
+        return jsonify(job_status(job)), 409
+    return send_file(job.result_path, mimetype=job.result_mimetype,
+                     as_attachment=True, download_name=job.result_filename)
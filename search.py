@@ -0,0 +1,125 @@
+from app import db
+from models import Customer, Battery, SystemSettings, mobile_digits
+from queries import batteries_with_customer
+from sqlalchemy import func, case, text
+
+SEARCH_LIMIT = 100
+CUSTOMER_MATCH_LIMIT = 500
+
+# Lower rank sorts first
+RANK_BATTERY_EXACT = 0
+RANK_BATTERY_PREFIX = 1
+RANK_MOBILE_EXACT = 2
+RANK_MOBILE_PREFIX = 3
+RANK_MOBILE_CONTAINS = 4
+RANK_NAME_PREFIX = 5
+RANK_NAME_CONTAINS = 6
+
+_trigram_available = None
+
+
+def normalize_mobile(value):
+    return ''.join(ch for ch in value if ch.isdigit())
+
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _has_trigram():
+    """Whether pg_trgm is installed, checked once per process"""
+    global _trigram_available
+    if _trigram_available is None:
+        _trigram_available = _is_postgres() and db.session.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).first() is not None
+    return _trigram_available
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _prefix_filter(expression, prefix):
+    if _is_postgres():
+        return expression.like(_escape_like(prefix) + '%', escape='\\')
+    # Half-open range so SQLite can walk the B-tree index
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return (expression >= prefix) & (expression < upper)
+
+
+def _match_customers(term):
+    """Return {customer_id: rank} for customers whose mobile or name matches"""
+    ranks = {}
+    digits = normalize_mobile(term)
+    separators = set(' -+()')
+
+    if digits and all(ch.isdigit() or ch in separators for ch in term):
+        digits_column = mobile_digits(Customer.mobile)
+        rows = db.session.query(Customer.id, digits_column).filter(
+            _prefix_filter(digits_column, digits)
+        ).limit(CUSTOMER_MATCH_LIMIT).all()
+        for customer_id, mobile in rows:
+            ranks[customer_id] = RANK_MOBILE_EXACT if mobile == digits else RANK_MOBILE_PREFIX
+
+        # Numbers stored with a country code ('+91 98765-43210') only match the
+        # local part as a substring; same trigram/fallback rule as names below
+        if _has_trigram() or not ranks:
+            contains = digits_column.like('%' + digits + '%')
+            for (customer_id,) in db.session.query(Customer.id).filter(contains).limit(CUSTOMER_MATCH_LIMIT):
+                ranks.setdefault(customer_id, RANK_MOBILE_CONTAINS)
+        return ranks
+
+    folded = term.lower()
+    name_column = func.lower(Customer.name)
+    for (customer_id,) in db.session.query(Customer.id).filter(
+            _prefix_filter(name_column, folded)).limit(CUSTOMER_MATCH_LIMIT):
+        ranks[customer_id] = RANK_NAME_PREFIX
+
+    # Substring matches use the trigram index on PostgreSQL; on SQLite the
+    # scan only runs when no prefix match was found
+    if _has_trigram() or not ranks:
+        contains = name_column.like('%' + _escape_like(folded) + '%', escape='\\')
+        for (customer_id,) in db.session.query(Customer.id).filter(contains).limit(CUSTOMER_MATCH_LIMIT):
+            ranks.setdefault(customer_id, RANK_NAME_CONTAINS)
+    return ranks
+
+
+def _battery_id_candidates(term):
+    """Exact battery IDs the term could refer to, e.g. '12' -> 'BAT0012'"""
+    candidates = {term.upper()}
+    if term.isdigit():
+        prefix = SystemSettings.get_setting('battery_id_prefix', 'BAT')
+        padding = int(SystemSettings.get_setting('battery_id_padding', '4'))
+        candidates.add(f"{prefix}{int(term):0{padding}d}")
+    return list(candidates)
+
+
+def search_batteries(term, statuses=None, newest_first=True, limit=SEARCH_LIMIT):
+    """Ranked battery search by battery ID, customer mobile or customer name.
+
+    Battery ID matches rank first, then mobile matches, then name matches.
+    Returns a query with customers eager-loaded.
+    """
+    term = term.strip()
+    if not term:
+        return batteries_with_customer().filter(db.false())
+
+    candidates = _battery_id_candidates(term)
+    customer_ranks = _match_customers(term)
+
+    exact_id = Battery.battery_id.in_(candidates)
+    prefix_id = _prefix_filter(Battery.battery_id, term.upper())
+    conditions = [exact_id, prefix_id]
+    whens = [(exact_id, RANK_BATTERY_EXACT), (prefix_id, RANK_BATTERY_PREFIX)]
+    for rank in sorted(set(customer_ranks.values())):
+        ids = [customer_id for customer_id, value in customer_ranks.items() if value == rank]
+        conditions.append(Battery.customer_id.in_(ids))
+        whens.append((Battery.customer_id.in_(ids), rank))
+
+    query = batteries_with_customer().filter(db.or_(*conditions))
+    if statuses:
+        query = query.filter(Battery.status.in_(statuses))
+
+    inward_order = Battery.inward_date.desc() if newest_first else Battery.inward_date.asc()
+    return query.order_by(case(*whens, else_=RANK_NAME_CONTAINS + 1), inward_order).limit(limit)
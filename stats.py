@@ -0,0 +1,192 @@
+from datetime import date, datetime
+from app import db
+from models import Battery, BatteryDailyRollup
+from sqlalchemy import func, case, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+PENDING_STATUSES = ['Received', 'Diagnosing', 'Repairing']
+
+
+def _pickup_amount(is_pickup, pickup_charge):
+    return (pickup_charge or 0.0) if is_pickup else 0.0
+
+
+def _as_day(value):
+    """Rollup day for an inward date; SQLite returns func.date() as a string"""
+    if value is None:
+        return datetime.utcnow().date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def daily_rollup_select():
+    """Grouped ``(day, status, count, service_revenue, pickup_revenue)`` rows from the battery table"""
+    day = func.date(Battery.inward_date)
+    return select(
+        day.label('day'),
+        Battery.status,
+        func.count(Battery.id).label('battery_count'),
+        func.coalesce(func.sum(Battery.service_price), 0.0).label('service_revenue'),
+        func.coalesce(func.sum(case((Battery.is_pickup == True, Battery.pickup_charge), else_=0.0)), 0.0).label('pickup_revenue')
+    ).group_by(day, Battery.status)
+
+
+def rebuild_daily_rollup(start=None, end=None):
+    """Recompute the daily rollup from the battery table in one grouped query.
+
+    ``start``/``end`` limit the rebuild to inward days in [start, end) for
+    partial backfills; by default every day is rebuilt.
+    """
+    query = daily_rollup_select()
+    delete = BatteryDailyRollup.query
+    if start is not None:
+        query = query.where(Battery.inward_date >= datetime.combine(start, datetime.min.time()))
+        delete = delete.filter(BatteryDailyRollup.day >= start)
+    if end is not None:
+        query = query.where(Battery.inward_date < datetime.combine(end, datetime.min.time()))
+        delete = delete.filter(BatteryDailyRollup.day < end)
+    rows = db.session.execute(query).all()
+
+    delete.delete(synchronize_session=False)
+    if rows:
+        db.session.execute(BatteryDailyRollup.__table__.insert(), [
+            {
+                'day': _as_day(inward_day),
+                'status': status,
+                'battery_count': count,
+                'service_revenue': float(service_revenue),
+                'pickup_revenue': float(pickup_revenue)
+            }
+            for inward_day, status, count, service_revenue, pickup_revenue in rows
+        ])
+    db.session.flush()
+    return len(rows)
+
+
+_UPSERTS = {'postgresql': postgresql_insert, 'sqlite': sqlite_insert}
+
+
+def _apply_deltas(deltas):
+    """Add ``{(day, status): (count, service_revenue, pickup_revenue)}`` to the rollup in one upsert.
+
+    INSERT ... ON CONFLICT DO UPDATE lets concurrent first writes to the same
+    day and status both land instead of one failing on the primary key.
+    """
+    rows = [
+        {'day': day, 'status': status, 'battery_count': count,
+         'service_revenue': service_revenue, 'pickup_revenue': pickup_revenue}
+        for (day, status), (count, service_revenue, pickup_revenue) in sorted(deltas.items())
+        if count or service_revenue or pickup_revenue
+    ]
+    if not rows:
+        return
+    table = BatteryDailyRollup.__table__
+    statement = _UPSERTS[db.session.get_bind().dialect.name](table).values(rows)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.status],
+        set_={
+            'battery_count': table.c.battery_count + statement.excluded.battery_count,
+            'service_revenue': table.c.service_revenue + statement.excluded.service_revenue,
+            'pickup_revenue': table.c.pickup_revenue + statement.excluded.pickup_revenue
+        }
+    ))
+
+
+def record_battery_created(battery):
+    """Add a newly registered battery to the rollup (call after flush, before commit)"""
+    record_batteries_created([{
+        'inward_date': battery.inward_date,
+        'status': battery.status,
+        'service_price': battery.service_price,
+        'is_pickup': battery.is_pickup,
+        'pickup_charge': battery.pickup_charge,
+    }])
+
+
+def record_batteries_created(rows):
+    """Add many inserted battery rows (dicts) to the rollup in one statement"""
+    deltas = {}
+    for row in rows:
+        key = (_as_day(row.get('inward_date')), row['status'])
+        count, service_revenue, pickup_revenue = deltas.get(key, (0, 0.0, 0.0))
+        deltas[key] = (
+            count + 1,
+            service_revenue + (row.get('service_price') or 0.0),
+            pickup_revenue + _pickup_amount(row.get('is_pickup'), row.get('pickup_charge'))
+        )
+    _apply_deltas(deltas)
+
+
+def record_status_change(battery, old_status, old_service_price):
+    """Move a battery between rollup rows after a status or price change (call before commit)"""
+    record_status_changes([(battery, old_status, old_service_price)])
+
+
+def record_status_changes(changes):
+    """Apply many ``(battery, old_status, old_service_price)`` moves in one statement"""
+    deltas = {}
+    for battery, old_status, old_service_price in changes:
+        day = _as_day(battery.inward_date)
+        pickup = _pickup_amount(battery.is_pickup, battery.pickup_charge)
+        for status, sign, price in ((old_status, -1, old_service_price), (battery.status, 1, battery.service_price)):
+            count, service_revenue, pickup_revenue = deltas.get((day, status), (0, 0.0, 0.0))
+            deltas[(day, status)] = (count + sign, service_revenue + sign * (price or 0.0), pickup_revenue + sign * pickup)
+    _apply_deltas(deltas)
+
+
+def rollup_rows(start=None, end=None):
+    """Return ``(day, status, count, service_revenue, pickup_revenue)`` rows for days in [start, end)"""
+    query = db.session.query(
+        BatteryDailyRollup.day,
+        BatteryDailyRollup.status,
+        BatteryDailyRollup.battery_count,
+        BatteryDailyRollup.service_revenue,
+        BatteryDailyRollup.pickup_revenue
+    )
+    if start is not None:
+        query = query.filter(BatteryDailyRollup.day >= start)
+    if end is not None:
+        query = query.filter(BatteryDailyRollup.day < end)
+    return query.all()
+
+
+def _status_totals():
+    """All-time count and revenue per status, summed over the rollup days"""
+    rows = db.session.query(
+        BatteryDailyRollup.status,
+        func.sum(BatteryDailyRollup.battery_count),
+        func.sum(BatteryDailyRollup.service_revenue),
+        func.sum(BatteryDailyRollup.pickup_revenue)
+    ).group_by(BatteryDailyRollup.status).all()
+    return {
+        status: (int(count or 0), float(service_revenue or 0.0), float(pickup_revenue or 0.0))
+        for status, count, service_revenue, pickup_revenue in rows
+    }
+
+
+def get_status_totals(status):
+    """Return count, service revenue and average service price for one status"""
+    count, service_revenue, _pickup = _status_totals().get(status, (0, 0.0, 0.0))
+    return {
+        'count': count,
+        'service_revenue': service_revenue,
+        'avg_service_price': service_revenue / count if count else 0.0
+    }
+
+
+def get_dashboard_stats():
+    """Return dashboard counters and revenue figures read from the daily rollup"""
+    by_status = _status_totals()
+    completed, service_revenue, pickup_revenue = by_status.get('Ready', (0, 0.0, 0.0))
+
+    return {
+        'total_batteries': sum(row[0] for row in by_status.values()),
+        'pending_batteries': sum(by_status[s][0] for s in PENDING_STATUSES if s in by_status),
+        'completed_batteries': completed,
+        'total_revenue': service_revenue + pickup_revenue,
+        'avg_service_price': service_revenue / completed if completed else 0.0
+    }
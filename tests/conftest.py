@@ -0,0 +1,79 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SESSION_SECRET', 'test')
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    from app import create_app, setup_database
+    database = tmp_path_factory.mktemp('db') / 'test.db'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'TESTING': True})
+    with app.app_context():
+        setup_database()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 302
+    return client
+
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager yielding a list whose length is the number of statements run inside it"""
+    from app import db
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    return counter
+
+
+@pytest.fixture(scope='session')
+def add_batteries(app):
+    """Function that registers ``count`` batteries and moves each through two more statuses"""
+    from app import db
+    from intake import bulk_intake
+    from models import Battery, User
+    from workflow import apply_status_changes
+
+    def add(count, with_history=True):
+        with app.app_context():
+            admin = User.query.filter_by(username='admin').one()
+            start = Battery.query.count()
+            result = bulk_intake([
+                {'customer_name': f'Customer {start + n}', 'mobile': f'90000{start + n:05d}',
+                 'battery_type': 'Car', 'voltage': '12V', 'capacity': '100Ah'}
+                for n in range(count)
+            ], admin.id)
+            db.session.commit()
+            ids = [row['id'] for row in result['created']]
+            if with_history:
+                for status in ('Diagnosing', 'Repairing'):
+                    batteries = Battery.query.filter(Battery.id.in_(ids)).all()
+                    apply_status_changes([(battery, status, 'checked', None) for battery in batteries], admin.id)
+                    db.session.commit()
+            return ids
+
+    return add
@@ -0,0 +1,84 @@
+"""A streamed backup restores to the same data, in every format the restore form accepts"""
+import gzip
+import io
+import json
+
+import pytest
+
+from backup import BackupError, gzip_stream, open_backup, restore_backup, stream_backup
+
+
+def snapshot():
+    from models import Battery
+    return sorted(
+        (battery.battery_id, battery.customer.name, battery.customer.mobile, battery.status,
+         battery.service_price, battery.inward_date,
+         tuple((entry.status, entry.comments, entry.updated_at) for entry in battery.status_history))
+        for battery in Battery.query.all()
+    )
+
+
+def backup_bytes(compress=False):
+    if compress:
+        return b''.join(gzip_stream(stream_backup(batch_size=3)))
+    return ''.join(stream_backup(batch_size=3)).encode('utf-8')
+
+
+def restore(app, data, filename):
+    from app import db
+    from models import User
+    with app.app_context():
+        admin = User.query.filter_by(username='admin').one()
+        counts = restore_backup(open_backup(io.BytesIO(data), filename), admin.id, admin.username, batch_size=4)
+        db.session.commit()
+        return counts
+
+
+@pytest.fixture(scope='module')
+def seeded(app, add_batteries):
+    add_batteries(7)
+    with app.app_context():
+        return snapshot()
+
+
+@pytest.mark.parametrize('filename, compress', [('backup.jsonl', False), ('backup.jsonl.gz', True)])
+def test_backup_round_trips(app, seeded, filename, compress):
+    with app.app_context():
+        data = backup_bytes(compress)
+    counts = restore(app, data, filename)
+    assert counts['batteries'] == len(seeded)
+    with app.app_context():
+        assert snapshot() == seeded
+
+
+def test_legacy_json_backup_still_restores(app, seeded):
+    with app.app_context():
+        lines = [json.loads(line) for line in backup_bytes().decode('utf-8').splitlines()[1:-1]]
+    legacy = {}
+    for record in lines:
+        legacy.setdefault(record['table'], []).append(record['row'])
+    restore(app, json.dumps(legacy).encode('utf-8'), 'backup.json')
+    with app.app_context():
+        assert snapshot() == seeded
+
+
+def test_tampered_backup_is_rejected(app, seeded):
+    from app import db
+    with app.app_context():
+        data = backup_bytes().replace(b'"Customer 1"', b'"Customer X"', 1)
+    with pytest.raises(BackupError):
+        restore(app, data, 'backup.jsonl')
+    with app.app_context():
+        db.session.rollback()
+        assert snapshot() == seeded
+
+
+def test_truncated_backup_is_rejected(app, seeded):
+    from app import db
+    with app.app_context():
+        data = gzip.compress(b''.join(backup_bytes().splitlines(keepends=True)[:-1]))
+    with pytest.raises(BackupError):
+        restore(app, data, 'backup.jsonl.gz')
+    with app.app_context():
+        db.session.rollback()
+        assert snapshot() == seeded
@@ -0,0 +1,26 @@
+"""Changing the battery ID prefix never hands out an ID that already exists"""
+
+
+def change_prefix(client, prefix):
+    response = client.post('/admin/settings', data={
+        'shop_name': 'Battery Repair Service', 'battery_id_prefix': prefix,
+        'battery_id_start': '1', 'battery_id_padding': '4'
+    })
+    assert response.status_code == 200
+
+
+def test_switching_back_to_a_prefix_continues_its_series(app, client, add_batteries):
+    from app import db
+    from models import Battery
+    try:
+        change_prefix(client, 'AAA')
+        first = add_batteries(2, with_history=False)
+        change_prefix(client, 'BBB')
+        add_batteries(1, with_history=False)
+        change_prefix(client, 'AAA')
+        again = add_batteries(2, with_history=False)
+    finally:
+        change_prefix(client, 'BAT')
+    with app.app_context():
+        codes = [db.session.get(Battery, battery_id).battery_id for battery_id in first + again]
+    assert codes == ['AAA0001', 'AAA0002', 'AAA0003', 'AAA0004']
@@ -0,0 +1,21 @@
+"""Expired change-log rows are purged by the write path, with no stream open"""
+from datetime import datetime, timedelta
+
+import events
+
+
+def test_recording_events_purges_expired_ones(app, add_batteries, monkeypatch):
+    from app import db
+    from models import BatteryEvent
+    add_batteries(2, with_history=False)
+    with app.app_context():
+        stale_ids = [event.id for event in BatteryEvent.query.all()]
+        BatteryEvent.query.update({'created_at': datetime.utcnow() - events.EVENT_RETENTION - timedelta(hours=1)})
+        db.session.commit()
+    monkeypatch.setattr(events, 'EVENT_PURGE_EVERY', 3)
+    monkeypatch.setattr(events, '_recorded_since_purge', 0)
+    add_batteries(3, with_history=False)
+    with app.app_context():
+        remaining = [event.id for event in BatteryEvent.query.all()]
+    assert len(remaining) == 3
+    assert not set(stale_ids) & set(remaining)
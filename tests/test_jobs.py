@@ -0,0 +1,58 @@
+"""Only jobs whose worker stopped heartbeating are failed, however long they have run"""
+import uuid
+from datetime import datetime, timedelta
+
+import jobs
+
+
+def add_job(started_ago, heartbeat_ago):
+    from app import db
+    from models import BackgroundJob
+    now = datetime.utcnow()
+    job = BackgroundJob()
+    job.id = uuid.uuid4().hex
+    job.kind = 'backup'
+    job.status = 'running'
+    job.created_by = 1
+    job.created_at = job.started_at = now - started_ago
+    job.heartbeat_at = now - heartbeat_ago if heartbeat_ago is not None else None
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def test_fail_stale_jobs_uses_heartbeat(app):
+    from app import db
+    from models import BackgroundJob
+    with app.app_context():
+        long_running = add_job(timedelta(hours=5), timedelta(seconds=1))
+        orphaned = add_job(timedelta(minutes=10), jobs.JOB_STALE_AFTER * 2)
+        never_beat = add_job(timedelta(minutes=10), None)
+        local = add_job(timedelta(minutes=10), jobs.JOB_STALE_AFTER * 2)
+        jobs._local_jobs.add(local)
+        try:
+            assert jobs.fail_stale_jobs() == 2
+            db.session.commit()
+        finally:
+            jobs._local_jobs.discard(local)
+        statuses = {job_id: db.session.get(BackgroundJob, job_id).status
+                    for job_id in (long_running, orphaned, never_beat, local)}
+    assert statuses == {long_running: 'running', orphaned: 'failed', never_beat: 'failed', local: 'running'}
+
+
+def test_heartbeat_saves_progress(app):
+    from app import db
+    from models import BackgroundJob
+    with app.app_context():
+        job_id = add_job(timedelta(minutes=10), jobs.JOB_STALE_AFTER * 2)
+        jobs._local_jobs.add(job_id)
+        jobs.report_progress(job_id, '10 bills rendered')
+        try:
+            jobs.write_heartbeats()
+        finally:
+            jobs._local_jobs.discard(job_id)
+            jobs._progress.pop(job_id)
+        db.session.expire_all()
+        job = db.session.get(BackgroundJob, job_id)
+        assert job.progress == '10 bills rendered'
+        assert datetime.utcnow() - job.heartbeat_at < timedelta(minutes=1)
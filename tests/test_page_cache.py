@@ -0,0 +1,13 @@
+"""Cached pages answer 304 only when the ETag still matches"""
+from datetime import datetime, timedelta
+
+
+def test_if_modified_since_alone_does_not_revalidate(client, add_batteries):
+    battery_id = add_batteries(1)[0]
+    url = f'/battery/{battery_id}/details'
+    first = client.get(url)
+    assert first.status_code == 200 and first.headers.get('ETag')
+
+    later = (datetime.utcnow() + timedelta(days=1)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    assert client.get(url, headers={'If-Modified-Since': later}).status_code == 200
+    assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
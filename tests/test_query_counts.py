@@ -0,0 +1,82 @@
+"""Per-request query counts stay flat as the number of batteries grows (no N+1 lazy loads)"""
+import pytest
+
+from documents import document_cache
+from page_cache import page_cache
+
+DASHBOARD_MAX_QUERIES = 6
+PANEL_MAX_QUERIES = 8
+DETAILS_MAX_QUERIES = 8
+
+
+def measure(client, count_queries, method, url, **kwargs):
+    """Statements run by one request, after a warm-up request fills the per-worker caches"""
+    getattr(client, method)(url, **kwargs)
+    page_cache.clear()
+    document_cache.clear()
+    with count_queries() as statements:
+        response = getattr(client, method)(url, **kwargs)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.fixture(scope='module')
+def battery_ids(add_batteries):
+    return add_batteries(5)
+
+
+def test_dashboard_query_count_is_flat(client, count_queries, battery_ids, add_batteries):
+    small = measure(client, count_queries, 'get', '/dashboard')
+    add_batteries(40)
+    large = measure(client, count_queries, 'get', '/dashboard')
+    assert large == small
+    assert large <= DASHBOARD_MAX_QUERIES
+
+
+@pytest.mark.parametrize('method, data', [('get', None), ('post', {'search_query': ''})])
+def test_technician_panel_query_count_is_flat(client, count_queries, battery_ids, add_batteries, method, data):
+    # POST with an empty search shows every pending battery with its recent history
+    small = measure(client, count_queries, method, '/technician/panel', data=data)
+    add_batteries(40)
+    large = measure(client, count_queries, method, '/technician/panel', data=data)
+    assert large == small
+    assert large <= PANEL_MAX_QUERIES
+
+
+def test_battery_details_query_count_ignores_history_length(app, client, count_queries, battery_ids):
+    from app import db
+    from models import Battery, User
+    from workflow import apply_status_changes
+
+    battery_id = battery_ids[0]
+    short = measure(client, count_queries, 'get', f'/battery/{battery_id}/details')
+    with app.app_context():
+        admin = User.query.filter_by(username='admin').one()
+        battery = db.session.get(Battery, battery_id)
+        for _ in range(20):
+            apply_status_changes([(battery, 'Repairing', 'more work', None)], admin.id)
+        db.session.commit()
+    long = measure(client, count_queries, 'get', f'/battery/{battery_id}/details')
+    assert long == short
+    assert long <= DETAILS_MAX_QUERIES
+
+
+def test_receipt_pdf_query_count_ignores_technicians(app, client, count_queries, battery_ids):
+    from app import db
+    from models import Battery, User
+    from workflow import apply_status_changes
+
+    battery_id = battery_ids[1]
+    one = measure(client, count_queries, 'get', f'/receipt/{battery_id}/pdf')
+    with app.app_context():
+        battery = db.session.get(Battery, battery_id)
+        for number in range(5):
+            technician = User(username=f'pdf-tech-{number}', full_name=f'Technician {number}',
+                              role='technician', password_hash='-')
+            db.session.add(technician)
+            db.session.flush()
+            apply_status_changes([(battery, 'Repairing', 'handed over', None)], technician.id)
+        db.session.commit()
+    many = measure(client, count_queries, 'get', f'/receipt/{battery_id}/pdf')
+    assert many == one
+    assert many <= DETAILS_MAX_QUERIES
@@ -0,0 +1,38 @@
+"""Mobile search finds numbers however they were typed in, and uses the digits index"""
+import pytest
+
+from search import search_batteries
+
+
+@pytest.fixture(scope='module')
+def stored_with_country_code(app):
+    from app import db
+    from intake import bulk_intake
+    from models import User
+    with app.app_context():
+        admin = User.query.filter_by(username='admin').one()
+        result = bulk_intake([{'customer_name': 'Country Code', 'mobile': '+91 98765-43210',
+                               'battery_type': 'Car', 'voltage': '12V', 'capacity': '100Ah'}], admin.id)
+        db.session.commit()
+        return result['created'][0]['battery_id']
+
+
+@pytest.mark.parametrize('term', ['98765', '98765 43210', '9876543210', '+91 98765 43210', '919876'])
+def test_mobile_with_country_code_and_separators(app, stored_with_country_code, term):
+    with app.app_context():
+        found = [battery.battery_id for battery in search_batteries(term)]
+    assert stored_with_country_code in found
+
+
+def test_mobile_prefix_uses_digits_index(app):
+    from app import db
+    from models import Customer, mobile_digits
+    from search import _prefix_filter
+    with app.app_context():
+        query = db.session.query(Customer.id).filter(_prefix_filter(mobile_digits(Customer.mobile), '98765'))
+        # Explain the statement as it is really sent, with its bound parameters
+        compiled = query.statement.compile(db.engine)
+        params = compiled.construct_params()
+        plan = ' '.join(row[-1] for row in db.session.connection().exec_driver_sql(
+            f'EXPLAIN QUERY PLAN {compiled}', tuple(params[name] for name in compiled.positiontup)))
+    assert 'ix_customer_mobile_digits' in plan
@@ -0,0 +1,29 @@
+"""The per-worker settings cache never serves a value that was rolled back"""
+from models import SystemSettings
+
+
+def test_rolled_back_setting_is_not_cached(app):
+    from app import db
+    with app.app_context():
+        before = SystemSettings.get_setting('shop_name')
+        SystemSettings.set_setting('shop_name', 'Never Saved')
+        assert SystemSettings.get_setting('shop_name') == 'Never Saved'
+        db.session.rollback()
+        assert SystemSettings.get_setting('shop_name') == before
+        SystemSettings.check_cache()
+        assert SystemSettings.get_setting('shop_name') == before
+
+
+def test_committed_setting_is_cached(app):
+    from app import db
+    with app.app_context():
+        before = SystemSettings.get_setting('shop_name')
+        try:
+            SystemSettings.set_setting('shop_name', 'Saved Shop')
+            db.session.commit()
+            SystemSettings.check_cache()
+            assert SystemSettings.get_setting('shop_name') == 'Saved Shop'
+            assert SystemSettings._cache['version'] is not None
+        finally:
+            SystemSettings.set_setting('shop_name', before)
+            db.session.commit()
@@ -0,0 +1,58 @@
+import os
+from ttl_cache import TTLCache
+
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '60'))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '1024'))
+
+
+class CachedUser:
+    """Compact stand-in for ``current_user`` holding only what requests need"""
+    __slots__ = ('id', 'role', 'full_name', 'active')
+
+    def __init__(self, id, role, full_name, active):
+        self.id = id
+        self.role = role
+        self.full_name = full_name
+        self.active = active
+
+    @property
+    def is_active(self):
+        return bool(self.active)
+
+    @property
+    def is_authenticated(self):
+        return self.is_active
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, CachedUser) and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class UserCache(TTLCache):
+    """TTL cache of CachedUser entries keyed by user id"""
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_size=USER_CACHE_SIZE):
+        super().__init__(ttl, max_size)
+
+
+user_cache = UserCache()
+
+
+def load_cached_user(user_id):
+    from app import db
+    from models import User
+
+    def loader(key):
+        row = db.session.query(User.id, User.role, User.full_name, User.active).filter(User.id == key).first()
+        return CachedUser(*row) if row else None
+
+    return user_cache.get(user_id, loader)
@@ -0,0 +1,54 @@
+from app import db
+from models import BatteryStatusHistory
+from stats import record_status_changes
+from events import record_event
+from page_cache import page_cache
+from documents import document_cache
+
+# Allowed status moves; re-posting the current status updates price and comments
+ALLOWED_TRANSITIONS = {
+    'Received': {'Diagnosing', 'Repairing', 'Ready'},
+    'Diagnosing': {'Diagnosing', 'Repairing', 'Ready'},
+    'Repairing': {'Diagnosing', 'Repairing', 'Ready'},
+    'Ready': {'Ready', 'Repairing'},
+}
+
+
+class TransitionError(ValueError):
+    """Raised when a status change is not allowed by the workflow"""
+
+
+def check_transition(old_status, new_status):
+    if new_status not in ALLOWED_TRANSITIONS:
+        raise TransitionError(f'Unknown status: {new_status}')
+    if new_status not in ALLOWED_TRANSITIONS.get(old_status, set()):
+        raise TransitionError(f'Cannot change status from {old_status} to {new_status}')
+
+
+def apply_status_changes(changes, user_id):
+    """Apply validated ``(battery, new_status, comments, service_price)`` changes.
+
+    Adds every history and event row to the current transaction and updates
+    the status summary once per touched status. The caller commits.
+    """
+    summary_changes = []
+    for battery, new_status, comments, service_price in changes:
+        old_status = battery.status
+        summary_changes.append((battery, old_status, battery.service_price))
+        battery.status = new_status
+        if service_price is not None:
+            battery.service_price = float(service_price)
+
+        # Add status history
+        status_history = BatteryStatusHistory()
+        status_history.battery_id = battery.id
+        status_history.status = new_status
+        status_history.comments = comments
+        status_history.updated_by = user_id
+        db.session.add(status_history)
+        record_event('status_changed', battery, old_status)
+        page_cache.invalidate_battery(battery.id)
+        document_cache.invalidate_battery(battery.id)
+
+    # Summary deltas use the pre-change prices captured above
+    record_status_changes(summary_changes)